@@ -0,0 +1,124 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import resource
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .parser import prepare_epub
+from .utils import SEGMENTER_TRF, SEGMENTERS, Span, get_segmenter
+
+DEFAULT_EPUB_PATH = Path(__file__).parents[2] / "tests" / "epub" / "epub30-spec.epub"
+
+
+@dataclass
+class SegmenterBenchmark:
+    segmenter: str
+    chapters: int
+    sentences: int
+    seconds: float
+    peak_rss_bytes: int
+    precision: float = 1.0
+    recall: float = 1.0
+
+    @property
+    def chapters_per_second(self) -> float:
+        return self.chapters / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def f1(self) -> float:
+        total = self.precision + self.recall
+        return 2 * self.precision * self.recall / total if total > 0 else 0.0
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def sentence_boundaries(texts: list[str], spans: list[list[Span]]) -> set[tuple[int, int]]:
+    """(chapter, offset) of the end of every non-blank sentence, ignoring trailing whitespace."""
+    boundaries = set()
+    for chapter, (text, text_spans) in enumerate(zip(texts, spans)):
+        for start, end in text_spans:
+            sentence = text[start:end].rstrip()
+            if sentence.strip():
+                boundaries.add((chapter, start + len(sentence)))
+    return boundaries
+
+
+def run_segmenter(segmenter: str, texts: list[str], batch_size: int) -> tuple[list[list[Span]], float, int]:
+    """Segment `texts`, returning the spans, the seconds spent segmenting and the process's peak RSS."""
+    backend = get_segmenter(segmenter)
+    start = time.perf_counter()
+    spans = backend.split(texts, batch_size=batch_size)
+    return spans, time.perf_counter() - start, peak_rss_bytes()
+
+
+def benchmark_segmenters(
+    epub_path: Path = DEFAULT_EPUB_PATH,
+    segmenters: tuple[str, ...] = SEGMENTERS,
+    reference: str = SEGMENTER_TRF,
+    batch_size: int = 32,
+) -> list[SegmenterBenchmark]:
+    """Time each segmenter over the chapters of `epub_path` and compare its boundaries with `reference`.
+
+    Every segmenter runs in a fresh process so that its model load and peak RSS are measured on their own. The
+    timing covers segmentation only, HTML parsing is done once up front and shared.
+    """
+    _, prepared = prepare_epub(epub_path)
+    texts = [text for _, text, _ in prepared]
+
+    results: dict[str, tuple[list[list[Span]], float, int]] = {}
+    context = multiprocessing.get_context("spawn")
+    for segmenter in dict.fromkeys((reference, *segmenters)):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[segmenter] = executor.submit(run_segmenter, segmenter, texts, batch_size).result()
+
+    reference_boundaries = sentence_boundaries(texts, results[reference][0])
+    benchmarks = []
+    for segmenter in segmenters:
+        spans, seconds, peak_rss = results[segmenter]
+        boundaries = sentence_boundaries(texts, spans)
+        matched = len(boundaries & reference_boundaries)
+        benchmarks.append(
+            SegmenterBenchmark(
+                segmenter=segmenter,
+                chapters=len(texts),
+                sentences=len(boundaries),
+                seconds=seconds,
+                peak_rss_bytes=peak_rss,
+                precision=matched / len(boundaries) if boundaries else 0.0,
+                recall=matched / len(reference_boundaries) if reference_boundaries else 0.0,
+            )
+        )
+    return benchmarks
+
+
+def print_benchmarks(benchmarks: list[SegmenterBenchmark], reference: str) -> None:
+    print(f"{'segmenter':<12} {'chapters/s':>10} {'sentences':>9} {'peak RSS MB':>11} {'P':>6} {'R':>6} {'F1':>6}")
+    for b in benchmarks:
+        print(
+            f"{b.segmenter:<12} {b.chapters_per_second:>10.1f} {b.sentences:>9} {b.peak_rss_bytes / 2**20:>11.0f} "
+            f"{b.precision:>6.3f} {b.recall:>6.3f} {b.f1:>6.3f}"
+        )
+    print(f"Precision, recall and F1 of sentence boundaries against {reference}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentence segmenters on an EPUB")
+    parser.add_argument("--epub-path", type=Path, default=DEFAULT_EPUB_PATH, help="Path to EPUB file")
+    parser.add_argument("--segmenters", nargs="+", choices=SEGMENTERS, default=list(SEGMENTERS))
+    parser.add_argument("--reference", choices=SEGMENTERS, default=SEGMENTER_TRF, help="Segmenter to compare with")
+    parser.add_argument("--batch-size", type=int, default=32, help="Chapters per nlp.pipe batch")
+    args = parser.parse_args()
+
+    benchmarks = benchmark_segmenters(args.epub_path, tuple(args.segmenters), args.reference, args.batch_size)
+    print_benchmarks(benchmarks, args.reference)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,120 @@
+import hashlib
+
 import chromadb
-from litellm import completion
-import numpy as np
 from chromadb import PersistentClient, Settings
 from pathlib import Path
 import sqlite3
 from typing import List, Tuple
 
-from pythonbin.epub.db import execute_sql_get_all
-from pythonbin.epub.embeddings import calculate_embeddings
-from pythonbin.epub.store import get_all_sentences, get_total_sentences
+from pythonbin.epub.codec import decode_embeddings, get_embedding_codec
+from pythonbin.epub.db import ensure_schema, execute_sql_get_all
+from pythonbin.epub.query import QueryCache, expand_query, get_query_embedding
+from pythonbin.epub.store import Sentence, get_all_sentences, get_total_sentences
+
+
+# expand_query moved to query.py and is re-exported for existing imports.
+__all__ = [
+    "COLLECTION_NAME",
+    "chroma_id",
+    "expand_query",
+    "get_collection_ids",
+    "initialize_chromadb",
+    "query_chromadb",
+]
+
+COLLECTION_NAME = "ebook_embeddings"
+
+
+def initialize_chromadb(
+    db_path: Path, chromadb_path: Path, context_window: int = 2, batch_size: int = 5000, rebuild: bool = False
+):
+    """Sync sentence embeddings from SQLite into ChromaDB.
 
+    Only sentences missing from the collection are added, and sentences no longer in SQLite are deleted, so
+    re-running after adding a book only pays for the new book. `rebuild` resets the collection first.
 
-def initialize_chromadb(db_path: Path, chromadb_path: Path, context_window: int = 2):
+    Documents are keyed by sentence id plus a digest of the context and embedding, so a sentence whose id was reused
+    or whose context or embedding changed is replaced rather than skipped.
+    """
     client = PersistentClient(
         path=str(chromadb_path),
         settings=Settings(
             allow_reset=True,
         ),
     )
-    client.reset()  # Resetting for initialization
-    collection = client.create_collection(name="ebook_embeddings")
+    if rebuild:
+        client.reset()
+    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    batch_size = min(batch_size, client.get_max_batch_size())
+
+    existing_ids = get_collection_ids(collection, batch_size)
+    print(f"Collection has {len(existing_ids)} sentences.")
 
     with sqlite3.connect(db_path) as conn:
+        ensure_schema(conn)
+        codec = get_embedding_codec(conn)
         total_sentences = get_total_sentences(conn)
 
+        ids: list[str] = []
+        documents: list[str] = []
+        embeddings: list[bytes] = []
+        seen_ids: set[str] = set()
+        added = 0
+
         for i, sentence in enumerate(get_all_sentences(conn, context_window=context_window)):
-            if i % 100 == 0:
-                print(f"Processed {i}/{total_sentences} sentences.")
-            collection.add(
-                documents=[sentence.sentence_context], embeddings=[sentence.embedding_list], ids=[str(sentence.id)]
-            )
+            if i % 10000 == 0:
+                print(f"Processed {i}/{total_sentences} sentences, added {added}.")
+            if sentence.embedding is None:
+                continue
 
+            sentence_id = chroma_id(sentence)
+            seen_ids.add(sentence_id)
+            if sentence_id in existing_ids:
+                continue
 
-def query_chromadb(query: str, chromadb_path: Path, n_results: int = 10) -> list[tuple[str, float]]:
-    client = PersistentClient(path=str(chromadb_path))
-    collection = client.get_collection(name="ebook_embeddings")
+            ids.append(sentence_id)
+            documents.append(sentence.sentence_context)
+            embeddings.append(sentence.embedding)
+            if len(ids) >= batch_size:
+                collection.upsert(ids=ids, embeddings=decode_embeddings(embeddings, codec), documents=documents)
+                added += len(ids)
+                ids, documents, embeddings = [], [], []
+
+        if ids:
+            collection.upsert(ids=ids, embeddings=decode_embeddings(embeddings, codec), documents=documents)
+            added += len(ids)
+
+    stale_ids = list(existing_ids - seen_ids)
+    for start in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[start : start + batch_size])
 
-    print(f"Original query: {query}")
-    expanded_query = expand_query(query)
-    print(f"Expanded query: {expanded_query}")
+    print(f"Added {added} sentences, removed {len(stale_ids)} stale sentences.")
 
-    prompt: str = f"Represent this query for searching relevant passages: {expanded_query}"
-    query_embedding = calculate_embeddings(prompt)
-    query_embedding_list = np.frombuffer(query_embedding, dtype=np.float32).tolist()
 
-    results = collection.query(query_embeddings=[query_embedding_list], n_results=n_results)
+def chroma_id(sentence: Sentence) -> str:
+    digest = hashlib.blake2b(sentence.sentence_context.encode(), digest_size=8)
+    digest.update(sentence.embedding)
+    return f"{sentence.id}-{digest.hexdigest()}"
+
+
+def get_collection_ids(collection, page_size: int) -> set[str]:
+    ids: set[str] = set()
+    offset = 0
+    while page := collection.get(include=[], limit=page_size, offset=offset)["ids"]:
+        ids.update(page)
+        offset += len(page)
+    return ids
+
+
+def query_chromadb(
+    query: str, chromadb_path: Path, n_results: int = 10, expand: bool = True, cache: QueryCache | None = None
+) -> list[tuple[str, float]]:
+    client = PersistentClient(path=str(chromadb_path))
+    collection = client.get_collection(name=COLLECTION_NAME)
+
+    query_embedding = get_query_embedding(query, expand=expand, cache=cache)
+
+    results = collection.query(query_embeddings=[query_embedding], n_results=n_results)
     if results is None:
         return []
     for x in results["documents"]:
@@ -53,16 +123,3 @@ def query_chromadb(query: str, chromadb_path: Path, n_results: int = 10) -> list
             print("---")
 
     # return list(zip(results.ids, results.distances))
-
-
-def expand_query(query: str, model: str = "ollama/llama3") -> str:
-    response = completion(
-        model=model,
-        messages=[
-            {"role": "system", "content": "Please generate a paragraph of text that answers the question."},
-            {"role": "user", "content": query},
-        ],
-        api_base="http://localhost:11434",
-    )
-    result = response.choices[0].message.content
-    return result
@@ -1,49 +1,226 @@
 import argparse
+from contextlib import contextmanager
+from collections.abc import Generator
 
 from pathlib import Path
 from pythonbin.epub.parser import read_epub
-from pythonbin.epub.store import store_ebook
-from pythonbin.epub.db import initialize_db
+from pythonbin.epub.store import get_chapter_hashes, store_ebook
+from pythonbin.epub.codec import CODEC_FLOAT32, EMBEDDING_CODECS, set_embedding_codec
+from pythonbin.epub.db import get_db_connection, initialize_db
 from pythonbin.epub.embeddings import store_embeddings
 from pythonbin.epub.chromadb_utils import initialize_chromadb, query_chromadb
+from pythonbin.epub.query import DEFAULT_CACHE_PATH, QueryCache, get_query_embedding
+from pythonbin.epub.library import find_epubs, store_library
+from pythonbin.epub.search import (
+    SEARCH_HYBRID,
+    SEARCH_LEXICAL,
+    SEARCH_MODES,
+    SEARCH_VECTOR,
+    build_ivf_index,
+    search_hybrid,
+    search_lexical,
+    search_sqlite,
+)
+from pythonbin.epub.utils import SEGMENTER_TRF, SEGMENTERS
 
 
-def main():
+@contextmanager
+def open_query_cache(args: argparse.Namespace) -> Generator[QueryCache | None, None, None]:
+    if args.no_cache:
+        yield None
+        return
+    with QueryCache(args.cache_path) as cache:
+        yield cache
+        print(f"Query cache: {cache.summary()}")
+
+
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="EPUB Parser and Storage")
     parser.add_argument(
         "action",
-        choices=["init-db", "store-ebook", "calc-embeddings", "init-chromadb", "query-chromadb"],
+        choices=[
+            "init-db",
+            "store-ebook",
+            "store-library",
+            "calc-embeddings",
+            "init-chromadb",
+            "query-chromadb",
+            "build-ivf",
+            "query-sqlite",
+        ],
         help="Action to perform",
     )
     parser.add_argument("--db-path", type=Path, required=True, help="Path to SQLite database file")
     parser.add_argument("--epub-path", type=Path, help="Path to EPUB file")
     parser.add_argument("--symbolic-name", type=str, help="Symbolic name for the EPUB file")
+    parser.add_argument(
+        "--library", type=str, help="Directory searched recursively for EPUB files, or a glob pattern, to store"
+    )
+    parser.add_argument("--library-workers", type=int, help="Worker processes for store-library, defaults to CPUs - 1")
     parser.add_argument("--chromadb-path", type=Path, help="Path to ChromaDB storage")
     parser.add_argument("--query", type=str, help="Query text for ChromaDB")
     parser.add_argument("--n-results", type=int, default=10, help="Number of results for query")
     parser.add_argument("--context-window", type=int, default=2, help="Context window for sentence embeddings")
+    parser.add_argument("--parse-workers", type=int, help="Worker processes for chapter parsing, defaults to CPUs - 1")
+    parser.add_argument(
+        "--segmenter",
+        choices=SEGMENTERS,
+        default=SEGMENTER_TRF,
+        help="Sentence segmenter: transformer parser, small model senter, rule-based sentencizer or regex",
+    )
+    parser.add_argument("--spacy-batch-size", type=int, default=32, help="Chapters per nlp.pipe batch")
+    parser.add_argument("--spacy-n-process", type=int, default=1, help="Processes used by nlp.pipe")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Number of sentences per insert batch")
+    parser.add_argument("--embed-batch-size", type=int, default=32, help="Number of sentences per embedding request")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Maximum concurrent embedding requests")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries for failed embedding requests")
+    parser.add_argument(
+        "--max-pending-batches", type=int, default=8, help="Batches read ahead of the embedding workers"
+    )
+    parser.add_argument("--write-batch-size", type=int, default=500, help="Embeddings per database transaction")
+    parser.add_argument(
+        "--flush-interval", type=float, default=1.0, help="Seconds before a partial embedding batch is committed"
+    )
+    parser.add_argument(
+        "--embedding-codec",
+        choices=EMBEDDING_CODECS,
+        help="Storage format for embeddings, set by init-db. A new database defaults to float32, an existing one keeps "
+        "its format",
+    )
+    parser.add_argument("--no-expand", action="store_true", help="Embed the query as-is without LLM expansion")
+    parser.add_argument(
+        "--cache-path", type=Path, default=DEFAULT_CACHE_PATH, help="Path to the query expansion and embedding cache"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the query cache")
+    parser.add_argument(
+        "--mode",
+        choices=SEARCH_MODES,
+        default=SEARCH_VECTOR,
+        help="query-sqlite search: embeddings, BM25 full-text without embedding the query, or both fused",
+    )
+    parser.add_argument("--ivf", action="store_true", help="Use the IVF index for query-sqlite")
+    parser.add_argument("--n-lists", type=int, help="Number of IVF lists for build-ivf, defaults to sqrt(n)")
+    parser.add_argument("--n-probe", type=int, default=8, help="Number of IVF lists searched per query")
+    parser.add_argument("--chromadb-batch-size", type=int, default=5000, help="Sentences per ChromaDB upsert")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Reset the ChromaDB collection instead of syncing incrementally"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="Resume the last unfinished calc-embeddings run from its checkpoint"
+    )
+    parser.add_argument("--reset", action="store_true", help="Delete an existing database in init-db")
+    parser.add_argument(
+        "--defer-index", action="store_true", help="Drop sentence indexes during the load and rebuild them at the end"
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.action == "init-db":
-        initialize_db(args.db_path)
+        is_new = args.reset or not args.db_path.exists()
+        initialize_db(args.db_path, reset=args.reset)
+        # Re-running init-db keeps the format of stored embeddings unless another one is asked for.
+        codec = args.embedding_codec
+        if codec is None and is_new:
+            codec = CODEC_FLOAT32
+        if codec is not None:
+            with get_db_connection(args.db_path) as conn:
+                set_embedding_codec(conn, codec)
     elif args.action == "store-ebook":
         if not args.epub_path or not args.symbolic_name:
             parser.error("--epub-path and --symbolic-name are required for storing an ebook")
-        ebook = read_epub(args.epub_path)
-        store_ebook(args.db_path, ebook, args.symbolic_name)
+        # Chapters already stored for this book are neither parsed nor stored again.
+        ebook = read_epub(
+            args.epub_path,
+            workers=args.parse_workers,
+            segmenter=args.segmenter,
+            batch_size=args.spacy_batch_size,
+            n_process=args.spacy_n_process,
+            known_hashes=get_chapter_hashes(args.db_path, args.symbolic_name),
+        )
+        store_ebook(args.db_path, ebook, args.symbolic_name, batch_size=args.batch_size, defer_index=args.defer_index)
+    elif args.action == "store-library":
+        if not args.library:
+            parser.error("--library is required for storing a library")
+        epub_paths = find_epubs(args.library)
+        if not epub_paths:
+            parser.error(f"No EPUB files found for {args.library}")
+        progress = store_library(
+            args.db_path,
+            epub_paths,
+            workers=args.library_workers,
+            segmenter=args.segmenter,
+            spacy_batch_size=args.spacy_batch_size,
+            spacy_n_process=args.spacy_n_process,
+            batch_size=args.batch_size,
+        )
+        print(progress.summary())
     elif args.action == "calc-embeddings":
-        store_embeddings(args.db_path, context_window=args.context_window)
+        store_embeddings(
+            args.db_path,
+            context_window=args.context_window,
+            batch_size=args.embed_batch_size,
+            max_in_flight=args.max_in_flight,
+            max_retries=args.max_retries,
+            max_pending_batches=args.max_pending_batches,
+            write_batch_size=args.write_batch_size,
+            flush_interval=args.flush_interval,
+            resume=args.resume,
+        )
     elif args.action == "init-chromadb":
         if not args.chromadb_path:
             parser.error("--chromadb-path is required for initializing ChromaDB")
-        initialize_chromadb(args.db_path, args.chromadb_path, context_window=args.context_window)
+        initialize_chromadb(
+            args.db_path,
+            args.chromadb_path,
+            context_window=args.context_window,
+            batch_size=args.chromadb_batch_size,
+            rebuild=args.rebuild,
+        )
     elif args.action == "query-chromadb":
         if not args.chromadb_path or not args.query:
             parser.error("--chromadb-path and --query are required for querying ChromaDB")
-        results = query_chromadb(args.query, args.chromadb_path, args.n_results)
+        with open_query_cache(args) as cache:
+            results = query_chromadb(
+                args.query, args.chromadb_path, args.n_results, expand=not args.no_expand, cache=cache
+            )
         # for result in results:
         #     print(f"ID: {result[0]}, Distance: {result[1]}")
+    elif args.action == "build-ivf":
+        with get_db_connection(args.db_path) as conn:
+            n_lists = build_ivf_index(conn, n_lists=args.n_lists)
+        print(f"Built IVF index with {n_lists} lists.")
+    elif args.action == "query-sqlite":
+        if not args.query:
+            parser.error("--query is required for querying SQLite")
+        query_embedding = None
+        if args.mode != SEARCH_LEXICAL:
+            with open_query_cache(args) as cache:
+                query_embedding = get_query_embedding(args.query, expand=not args.no_expand, cache=cache)
+        with get_db_connection(args.db_path) as conn:
+            if args.mode == SEARCH_LEXICAL:
+                results = search_lexical(conn, args.query, k=args.n_results, context_window=args.context_window)
+            elif args.mode == SEARCH_HYBRID:
+                results = search_hybrid(
+                    conn,
+                    args.query,
+                    query_embedding,  # type: ignore
+                    k=args.n_results,
+                    use_ivf=args.ivf,
+                    n_probe=args.n_probe,
+                    context_window=args.context_window,
+                )
+            else:
+                results = search_sqlite(
+                    conn,
+                    query_embedding,  # type: ignore
+                    k=args.n_results,
+                    use_ivf=args.ivf,
+                    n_probe=args.n_probe,
+                    context_window=args.context_window,
+                )
+        for result in results:
+            print(f"[{result.score:.3f}] {result.sentence_context}")
+            print("---")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+import sqlite3
+
+import numpy as np
+
+from .db import get_setting, set_setting, table_exists
+
+CODEC_FLOAT32 = "float32"
+CODEC_FLOAT16 = "float16"
+CODEC_INT8 = "int8"
+EMBEDDING_CODECS = (CODEC_FLOAT32, CODEC_FLOAT16, CODEC_INT8)
+
+EMBEDDING_CODEC_SETTING = "embedding_codec"
+
+# int8 blobs start with the float32 scale that maps the quantized values back to the original range.
+INT8_SCALE_BYTES = 4
+
+
+def encode_embedding(embedding: np.ndarray, codec: str = CODEC_FLOAT32) -> bytes:
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if codec == CODEC_FLOAT32:
+        return embedding.tobytes()
+    if codec == CODEC_FLOAT16:
+        return embedding.astype(np.float16).tobytes()
+    if codec == CODEC_INT8:
+        max_abs = float(np.max(np.abs(embedding))) if embedding.size else 0.0
+        scale = max_abs / 127 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(embedding / scale), -127, 127).astype(np.int8)
+        return np.float32(scale).tobytes() + quantized.tobytes()
+    raise ValueError(f"Unknown embedding codec: {codec}")
+
+
+def decode_embedding(blob: bytes, codec: str = CODEC_FLOAT32) -> np.ndarray:
+    """Decode a stored embedding into a float32 array."""
+    if codec == CODEC_FLOAT32:
+        return np.frombuffer(blob, dtype=np.float32)
+    if codec == CODEC_FLOAT16:
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if codec == CODEC_INT8:
+        scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=INT8_SCALE_BYTES).astype(np.float32) * scale
+    raise ValueError(f"Unknown embedding codec: {codec}")
+
+
+def decode_embeddings(blobs: list[bytes], codec: str = CODEC_FLOAT32) -> np.ndarray:
+    """Decode equal-length stored embeddings into one contiguous (n, dim) float32 matrix."""
+    if not blobs:
+        return np.empty((0, 0), dtype=np.float32)
+    data = b"".join(blobs)
+    if codec == CODEC_FLOAT32:
+        return np.frombuffer(data, dtype=np.float32).reshape(len(blobs), -1)
+    if codec == CODEC_FLOAT16:
+        return np.frombuffer(data, dtype=np.float16).reshape(len(blobs), -1).astype(np.float32)
+    if codec == CODEC_INT8:
+        dim = len(blobs[0]) - INT8_SCALE_BYTES
+        rows = np.frombuffer(data, dtype=np.dtype([("scale", "<f4"), ("values", "i1", (dim,))]))
+        return rows["values"].astype(np.float32) * rows["scale"][:, np.newaxis]
+    raise ValueError(f"Unknown embedding codec: {codec}")
+
+
+def get_embedding_codec(conn: sqlite3.Connection) -> str:
+    """Return the codec embeddings in this database are stored with; databases without one use float32."""
+    return get_setting(conn, EMBEDDING_CODEC_SETTING, CODEC_FLOAT32)
+
+
+def set_embedding_codec(conn: sqlite3.Connection, codec: str) -> None:
+    if codec not in EMBEDDING_CODECS:
+        raise ValueError(f"Unknown embedding codec: {codec}")
+    current = get_embedding_codec(conn)
+    if codec != current:
+        has_embeddings = conn.execute("SELECT 1 FROM sentences WHERE embedding IS NOT NULL LIMIT 1").fetchone()
+        if has_embeddings is not None:
+            raise ValueError(f"Cannot change embedding codec from {current} to {codec} once embeddings are stored")
+        # Cached embeddings are encoded with the old codec and would never be read again.
+        if table_exists(conn, "embedding_cache"):
+            conn.execute("DELETE FROM embedding_cache")
+    set_setting(conn, EMBEDDING_CODEC_SETTING, codec)
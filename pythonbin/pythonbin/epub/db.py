@@ -51,6 +51,20 @@ def get_db_connection(db_path: Path) -> Generator[sqlite3.Connection, None, None
         conn.close()
 
 
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Generator[sqlite3.Connection, None, None]:
+    """Run the enclosed statements in a single transaction, rolling back on error."""
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
 def incremental_vacuum(conn: sqlite3.Connection, n_pages: int = 100) -> None:
     conn.execute(f"PRAGMA incremental_vacuum({n_pages});")
 
@@ -71,8 +85,221 @@ def execute_sql_get_all(conn: sqlite3.Connection, sql: str, *args) -> Generator[
         yield row
 
 
-def initialize_db(db_path: Path) -> None:
-    if db_path.exists():
+SENTENCE_INDEXES: dict[str, str] = {
+    "idx_sentence_index": "CREATE INDEX IF NOT EXISTS idx_sentence_index ON sentences (sentence_index)",
+    "idx_sentence_chapter": (
+        "CREATE INDEX IF NOT EXISTS idx_sentence_chapter ON sentences (chapter_id, sentence_index)"
+    ),
+    # Partial index holding only sentences still waiting for an embedding, so finding remaining work is cheap.
+    "idx_sentence_missing_embedding": (
+        "CREATE INDEX IF NOT EXISTS idx_sentence_missing_embedding ON sentences (chapter_id) WHERE embedding IS NULL"
+    ),
+}
+
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    for sql in SENTENCE_INDEXES.values():
+        conn.execute(sql)
+
+
+def drop_indexes(conn: sqlite3.Connection) -> None:
+    for name in SENTENCE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def create_embedding_jobs_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_jobs (
+            id INTEGER PRIMARY KEY,
+            model TEXT NOT NULL,
+            context_window INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            first_sentence_id INTEGER NOT NULL,
+            last_sentence_id INTEGER NOT NULL,
+            checkpoint_sentence_id INTEGER NOT NULL,
+            total_sentences INTEGER NOT NULL,
+            processed_sentences INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+    )
+
+
+def create_settings_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """
+    )
+
+
+def get_setting(conn: sqlite3.Connection, key: str, default: str) -> str:
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before the settings table existed use the defaults.
+        return default
+    return row[0] if row is not None else default
+
+
+def set_setting(conn: sqlite3.Connection, key: str, value: str) -> None:
+    create_settings_table(conn)
+    conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+    conn.commit()
+
+
+def create_embedding_cache_table(conn: sqlite3.Connection) -> None:
+    # Embeddings keyed by a hash of the model and the embedded text, shared by every sentence with the same context.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            text_hash BLOB PRIMARY KEY,
+            embedding BLOB NOT NULL
+        ) WITHOUT ROWID
+    """
+    )
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+FTS_INSERT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS sentences_fts_insert AFTER INSERT ON sentences BEGIN
+        INSERT INTO sentences_fts (rowid, sentence) VALUES (new.id, new.sentence);
+    END
+"""
+
+FTS_DELETE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS sentences_fts_delete AFTER DELETE ON sentences BEGIN
+        INSERT INTO sentences_fts (sentences_fts, rowid, sentence) VALUES ('delete', old.id, old.sentence);
+    END
+"""
+
+# Only changes to the text touch the index, storing embeddings does not.
+FTS_UPDATE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS sentences_fts_update AFTER UPDATE OF sentence ON sentences BEGIN
+        INSERT INTO sentences_fts (sentences_fts, rowid, sentence) VALUES ('delete', old.id, old.sentence);
+        INSERT INTO sentences_fts (rowid, sentence) VALUES (new.id, new.sentence);
+    END
+"""
+
+
+def create_fts_table(conn: sqlite3.Connection) -> None:
+    """Create the FTS5 index over sentence text, kept in sync with the sentences table by triggers.
+
+    The index uses the sentences table as its external content, so the text is not stored twice. Underscores are
+    token characters, so identifiers like `get_item_with_href` are indexed as one term. An index added to an existing
+    database is filled from the stored sentences.
+    """
+    exists = table_exists(conn, "sentences_fts")
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS sentences_fts USING fts5(
+            sentence,
+            content='sentences',
+            content_rowid='id',
+            tokenize="unicode61 tokenchars '_'"
+        )
+    """
+    )
+    for sql in (FTS_INSERT_TRIGGER, FTS_DELETE_TRIGGER, FTS_UPDATE_TRIGGER):
+        conn.execute(sql)
+    if not exists:
+        conn.execute("INSERT INTO sentences_fts (sentences_fts) VALUES ('rebuild')")
+
+
+@contextmanager
+def bulk_fts_insert(conn: sqlite3.Connection) -> Generator[None, None, None]:
+    """Index the sentences inserted in the enclosed block with one statement instead of the per-row trigger.
+
+    Indexing row by row makes bulk inserts about ten times slower. Must run inside a transaction, so other connections
+    never see the trigger missing. New sentences get ids above the current maximum, which is how they are found.
+    """
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM sentences").fetchone()[0]
+    conn.execute("DROP TRIGGER IF EXISTS sentences_fts_insert")
+    yield
+    conn.execute(
+        "INSERT INTO sentences_fts (rowid, sentence) SELECT id, sentence FROM sentences WHERE id > ?", (last_id,)
+    )
+    conn.execute(FTS_INSERT_TRIGGER)
+
+
+# Changes whenever the stored embeddings change, so copies of them kept outside the database can tell they are stale.
+EMBEDDINGS_VERSION_SETTING = "embeddings_version"
+
+EMBEDDINGS_VERSION_INSERT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS sentences_embeddings_version_insert AFTER INSERT ON sentences
+    WHEN new.embedding IS NOT NULL BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'embeddings_version';
+    END
+"""
+
+EMBEDDINGS_VERSION_UPDATE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS sentences_embeddings_version_update AFTER UPDATE OF embedding ON sentences
+    WHEN old.embedding IS NOT new.embedding BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'embeddings_version';
+    END
+"""
+
+EMBEDDINGS_VERSION_DELETE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS sentences_embeddings_version_delete AFTER DELETE ON sentences
+    WHEN old.embedding IS NOT NULL BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'embeddings_version';
+    END
+"""
+
+
+def create_embeddings_version_triggers(conn: sqlite3.Connection) -> None:
+    """Count changes to the stored embeddings in the embeddings_version setting.
+
+    The count starts at a random value, so a database that was deleted and created again does not repeat the versions
+    of the old one.
+    """
+    conn.execute(
+        "INSERT OR IGNORE INTO settings (key, value) VALUES (?, abs(random() % 1000000000000))",
+        (EMBEDDINGS_VERSION_SETTING,),
+    )
+    for sql in (
+        EMBEDDINGS_VERSION_INSERT_TRIGGER,
+        EMBEDDINGS_VERSION_UPDATE_TRIGGER,
+        EMBEDDINGS_VERSION_DELETE_TRIGGER,
+    ):
+        conn.execute(sql)
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if columns and column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create tables, columns and indexes added after a database was first initialized."""
+    create_settings_table(conn)
+    create_embedding_jobs_table(conn)
+    create_embedding_cache_table(conn)
+    # Chapters are matched by content hash on re-ingestion; chapter_index keeps the reading order of a book whose
+    # changed chapters were re-inserted at the end.
+    add_column(conn, "chapters", "content_hash", "TEXT")
+    add_column(conn, "chapters", "chapter_index", "INTEGER")
+    if table_exists(conn, "chapters"):
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chapter_ebook ON chapters (ebook_id, content_hash)")
+    if table_exists(conn, "sentences"):
+        create_fts_table(conn)
+        create_embeddings_version_triggers(conn)
+    create_indexes(conn)
+    conn.commit()
+
+
+def initialize_db(db_path: Path, reset: bool = False) -> None:
+    """Create the database tables. An existing database is kept and brought up to date unless `reset` is set."""
+    if reset and db_path.exists():
         db_path.unlink()
 
     with get_db_connection(db_path) as conn:
@@ -95,6 +322,8 @@ def initialize_db(db_path: Path) -> None:
                 ebook_id INTEGER NOT NULL,
                 title TEXT NOT NULL,
                 raw_content TEXT NOT NULL,
+                content_hash TEXT,
+                chapter_index INTEGER,
                 FOREIGN KEY (ebook_id) REFERENCES ebooks (id)
             )
         """,
@@ -114,9 +343,4 @@ def initialize_db(db_path: Path) -> None:
         """,
         )
 
-        execute_sql(
-            conn,
-            """
-            CREATE INDEX IF NOT EXISTS idx_sentence_index ON sentences (sentence_index)
-        """,
-        )
+        ensure_schema(conn)
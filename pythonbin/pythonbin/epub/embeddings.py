@@ -1,19 +1,29 @@
-import concurrent.futures
+import collections
+import hashlib
+import itertools
 import json
 import threading
 import queue
+import sqlite3
 import time
-import os
+from collections.abc import Iterable, Iterator
 
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
-from .db import get_db_connection, execute_sql, execute_sql_get_all
-from .store import get_all_sentences, get_total_sentences
+from .codec import CODEC_FLOAT32, decode_embedding, encode_embedding, get_embedding_codec
+from .db import get_db_connection, execute_sql_get_all, ensure_schema, transaction
+from .jobs import JOB_DONE, JOB_FAILED, EmbeddingJob, create_job, get_resumable_job, set_job_status, update_checkpoint
+from .store import Sentence, get_all_sentences
 
 EMBEDDING_API_URL = "http://localhost:11434/api/embeddings"
+EMBED_BATCH_API_URL = "http://localhost:11434/api/embed"
 EMBEDDING_MODEL = "mxbai-embed-large"
 
+# HTTP statuses worth retrying, everything else is raised immediately.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 def calculate_embeddings(sentence: str, model: str = EMBEDDING_MODEL) -> bytes:
     response = requests.post(EMBEDDING_API_URL, json={"model": model, "prompt": sentence})
@@ -23,71 +33,410 @@ def calculate_embeddings(sentence: str, model: str = EMBEDDING_MODEL) -> bytes:
     return embedding_array.tobytes()
 
 
+def embedding_cache_key(model: str, codec: str, text: str) -> bytes:
+    # Cached blobs are stored encoded, so the codec is part of the key.
+    return hashlib.blake2b(f"{model}\0{codec}\0{text}".encode(), digest_size=16).digest()
+
+
+def get_cached_embeddings(conn: sqlite3.Connection, keys: list[bytes]) -> dict[bytes, bytes]:
+    unique_keys = list(dict.fromkeys(keys))
+    if not unique_keys:
+        return {}
+    placeholders = ", ".join("?" * len(unique_keys))
+    rows = conn.execute(
+        f"SELECT text_hash, embedding FROM embedding_cache WHERE text_hash IN ({placeholders})", unique_keys
+    )
+    return dict(rows.fetchall())
+
+
+def batched(iterable: Iterable[Sentence], n: int) -> Iterator[list[Sentence]]:
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, n)):
+        yield batch
+
+
+class EmbeddingStats:
+    """Thread-safe throughput and request latency counters for the embedding client."""
+
+    def __init__(self, max_samples: int = 10000):
+        self.lock = threading.Lock()
+        self.latencies: collections.deque[float] = collections.deque(maxlen=max_samples)
+        self.embedded = 0
+        self.started_at: float | None = None
+
+    def record(self, latency: float, count: int) -> None:
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = time.perf_counter() - latency
+            self.latencies.append(latency)
+            self.embedded += count
+
+    def sentences_per_second(self) -> float:
+        with self.lock:
+            if self.started_at is None:
+                return 0.0
+            elapsed = time.perf_counter() - self.started_at
+            return self.embedded / elapsed if elapsed > 0 else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        with self.lock:
+            if not self.latencies:
+                return 0.0
+            return float(np.percentile(self.latencies, percentile))
+
+    def summary(self) -> str:
+        return (
+            f"{self.sentences_per_second():.1f} sentences/sec, "
+            f"p50 {self.latency_percentile(50) * 1000:.0f}ms, p99 {self.latency_percentile(99) * 1000:.0f}ms"
+        )
+
+
+class EmbeddingClient:
+    """Embeds batches of texts through the Ollama batch embed API.
+
+    Requests share a pooled HTTP session, at most `max_in_flight` requests run concurrently, and failed requests are
+    retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        api_url: str = EMBED_BATCH_API_URL,
+        batch_size: int = 32,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 120.0,
+    ):
+        self.model = model
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = EmbeddingStats()
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[np.ndarray]:
+        with self.in_flight:
+            start = time.perf_counter()
+            embeddings = self._post_with_retry(texts)
+            self.stats.record(time.perf_counter() - start, len(texts))
+
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return [np.array(embedding, dtype=np.float32) for embedding in embeddings]
+
+    def _post_with_retry(self, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(
+                    self.api_url, json={"model": self.model, "input": texts}, timeout=self.timeout
+                )
+                response.raise_for_status()
+                return json.loads(response.content)["embeddings"]
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status_code = e.response.status_code if e.response is not None else None
+                retryable = status_code is None or status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff * (2**attempt)
+                print(f"Embedding request failed ({e}), retrying in {delay:.1f}s.")
+                time.sleep(delay)
+                attempt += 1
+
+
 class SentenceProcessor:
-    def __init__(self, db_path: Path, context_window: int = 2):
+    """Embeds sentences missing an embedding through a bounded pipeline.
+
+    A producer streams sentences from the database into a work queue of batches, `client.max_in_flight` workers
+    embed the batches, and a single writer thread stores the results. Both queues are bounded, so memory stays
+    constant regardless of corpus size and a slow stage blocks the stages feeding it.
+
+    Each run is recorded as an `EmbeddingJob` whose checkpoint is committed together with the embeddings, so with
+    `resume` an interrupted run picks up after the checkpoint instead of rescanning the table.
+
+    Embeddings are also stored in `embedding_cache`, keyed by model, codec and embedded text. Sentences whose context
+    was embedded before, in this or any other book, reuse that embedding instead of sending a request.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        context_window: int = 2,
+        client: EmbeddingClient | None = None,
+        max_pending_batches: int = 8,
+        max_pending_results: int = 1000,
+        write_batch_size: int = 500,
+        flush_interval: float = 1.0,
+        resume: bool = False,
+    ):
         self.db_path = db_path
-        self.queue = queue.Queue(maxsize=100)  # Adjust the maxsize as needed
+        self.client = client if client is not None else EmbeddingClient()
+        self.work_queue: queue.Queue[tuple[int, list[Sentence]] | None] = queue.Queue(maxsize=max_pending_batches)
+        # (embedding, sentence id, batch number, cache key for new embeddings or None for cached ones)
+        self.queue: queue.Queue[tuple[bytes, int, int, bytes | None]] = queue.Queue(maxsize=max_pending_results)
         self.counter_lock = threading.Lock()
         self.db_thread = threading.Thread(target=self.write_to_db, daemon=True)
         self.processed_sentences = 0
+        self.cached_sentences = 0
         self.stop_event = threading.Event()
+        self.abort_event = threading.Event()
+        self.error: BaseException | None = None
         self.context_window = context_window
+        self.write_batch_size = write_batch_size
+        self.flush_interval = flush_interval
+        self.resume = resume
+        self.job: EmbeddingJob | None = None
+        self.codec = CODEC_FLOAT32
+
+        # Batches are numbered in dispatch order; the checkpoint only advances past a batch once it and every batch
+        # before it has been written. Maps batch number to [sentences not yet written, last sentence id].
+        self.checkpoint_lock = threading.Lock()
+        self.pending_batches: dict[int, list[int]] = {}
+        self.next_batch = 0
+        self.next_checkpoint_batch = 0
+        self.checkpoint_sentence_id = 0
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.stop_event.set()
-        self.db_thread.join()
+        if self.db_thread.is_alive():
+            self.db_thread.join()
+
+    def _abort(self, error: BaseException) -> None:
+        if self.error is None:
+            self.error = error
+        self.abort_event.set()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Block until `item` is queued, giving up if another stage has failed."""
+        while not self.abort_event.is_set():
+            try:
+                target.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def register_batch(self, sentences: list[Sentence]) -> int:
+        with self.checkpoint_lock:
+            batch_number = self.next_batch
+            self.next_batch += 1
+            self.pending_batches[batch_number] = [len(sentences), max(sentence.id for sentence in sentences)]
+        return batch_number
+
+    def advance_checkpoint(self, batch_numbers: list[int]) -> int:
+        with self.checkpoint_lock:
+            for batch_number in batch_numbers:
+                self.pending_batches[batch_number][0] -= 1
+            while (pending := self.pending_batches.get(self.next_checkpoint_batch)) is not None and pending[0] == 0:
+                self.checkpoint_sentence_id = pending[1]
+                del self.pending_batches[self.next_checkpoint_batch]
+                self.next_checkpoint_batch += 1
+            return self.checkpoint_sentence_id
+
+    def process_batch(self, conn: sqlite3.Connection, batch_number: int, sentences: list[Sentence]) -> None:
+        keys = [embedding_cache_key(self.client.model, self.codec, sentence.sentence_context) for sentence in sentences]
+        cached = get_cached_embeddings(conn, keys)
 
-    def process_sentence(self, sentence) -> None:
-        embedding = calculate_embeddings(sentence.sentence_context)
-        self.queue.put((embedding, sentence.id))
+        # Identical contexts are embedded once, whether they repeat within the batch or were embedded before.
+        missing = {key: sentence.sentence_context for key, sentence in zip(keys, sentences) if key not in cached}
+        embedded: dict[bytes, bytes] = {}
+        if missing:
+            embeddings = self.client.embed_batch(list(missing.values()))
+            embedded = {key: encode_embedding(embedding, self.codec) for key, embedding in zip(missing, embeddings)}
+
+        with self.counter_lock:
+            self.cached_sentences += sum(1 for key in keys if key in cached)
+        for sentence, key in zip(sentences, keys):
+            item = (
+                (embedded[key], sentence.id, batch_number, key)
+                if key in embedded
+                else (cached[key], sentence.id, batch_number, None)
+            )
+            if not self._put(self.queue, item):
+                return
+
+    def embed_worker(self) -> None:
+        try:
+            # Each worker reads the embedding cache through its own connection.
+            with get_db_connection(self.db_path) as conn:
+                while not self.abort_event.is_set():
+                    try:
+                        batch = self.work_queue.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if batch is None:
+                        return
+                    self.process_batch(conn, *batch)
+        except Exception as e:  # noqa: BLE001 - handed to the main thread, which raises it
+            self._abort(e)
 
     def print_status(self, total_sentences: int) -> None:
         while not self.stop_event.is_set():
             with self.counter_lock:
-                print(f"Processed {self.processed_sentences}/{total_sentences} sentences.")
-            time.sleep(5)
+                print(
+                    f"Processed {self.processed_sentences}/{total_sentences} sentences. {self.client.stats.summary()}"
+                )
+            self.stop_event.wait(5)
 
     def write_to_db(self) -> None:
-        with get_db_connection(self.db_path) as conn:
-            while (not self.stop_event.is_set()) or (not self.queue.empty()):
-                try:
-                    embedding, sentence_id = self.queue.get(timeout=1)
-                    execute_sql(conn, "UPDATE sentences SET embedding = ? WHERE id = ?", embedding, sentence_id)
-                    with self.counter_lock:
-                        self.processed_sentences += 1
-                except queue.Empty:
-                    continue
+        """Drain results into the database, committing a batch once it is full or `flush_interval` has passed."""
+        try:
+            with get_db_connection(self.db_path) as conn:
+                batch: list[tuple[bytes, int, int, bytes | None]] = []
+                last_flush = time.monotonic()
+                while (not self.stop_event.is_set()) or (not self.queue.empty()):
+                    timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+                    try:
+                        batch.append(self.queue.get(timeout=timeout))
+                    except queue.Empty:
+                        pass
+
+                    if len(batch) >= self.write_batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                        self.flush(conn, batch)
+                        batch = []
+                        last_flush = time.monotonic()
+
+                self.flush(conn, batch)
+        except Exception as e:  # noqa: BLE001 - handed to the main thread, which raises it
+            self._abort(e)
+
+    def flush(self, conn: sqlite3.Connection, batch: list[tuple[bytes, int, int, bytes | None]]) -> None:
+        if not batch:
+            return
+        with transaction(conn):
+            conn.executemany(
+                "UPDATE sentences SET embedding = ? WHERE id = ?",
+                [(embedding, sentence_id) for embedding, sentence_id, _, _ in batch],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (text_hash, embedding) VALUES (?, ?)",
+                [(key, embedding) for embedding, _, _, key in batch if key is not None],
+            )
+            checkpoint = self.advance_checkpoint([batch_number for _, _, batch_number, _ in batch])
+            if self.job is not None:
+                update_checkpoint(conn, self.job.id, checkpoint, len(batch))
+        with self.counter_lock:
+            self.processed_sentences += len(batch)
+
+    def start_job(self, conn: sqlite3.Connection) -> EmbeddingJob | None:
+        if self.resume:
+            job = get_resumable_job(conn, self.client.model, self.context_window)
+            if job is not None:
+                print(
+                    f"Resuming job {job.id} after sentence {job.checkpoint_sentence_id} "
+                    f"({job.processed_sentences}/{job.total_sentences} sentences done)."
+                )
+                return job
+            print("No unfinished job to resume, starting a new one.")
+        return create_job(conn, self.client.model, self.context_window)
 
     def start_processing(self) -> None:
-        self.db_thread.start()
         with get_db_connection(self.db_path) as conn:
-            total_sentences = get_total_sentences(conn, embedding_missing=True)
-            sentences = get_all_sentences(conn, embedding_missing=True, context_window=self.context_window)
-            workers = max(os.cpu_count() // 2, 1)  # type: ignore
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                # Start a separate thread for printing the status
-                status_thread = threading.Thread(target=self.print_status, args=(total_sentences,), daemon=True)
-                status_thread.start()
+            # Databases created before the job table and indexes existed need them before the first run.
+            ensure_schema(conn)
+            self.codec = get_embedding_codec(conn)
+            self.job = self.start_job(conn)
+            if self.job is None:
+                print("No sentences are missing embeddings.")
+                return
+
+            self.processed_sentences = self.job.processed_sentences
+            self.checkpoint_sentence_id = self.job.checkpoint_sentence_id
+            sentences = get_all_sentences(
+                conn,
+                embedding_missing=True,
+                context_window=self.context_window,
+                after_id=self.job.checkpoint_sentence_id,
+                until_id=self.job.last_sentence_id,
+            )
+
+            self.db_thread.start()
+            status_thread = threading.Thread(target=self.print_status, args=(self.job.total_sentences,), daemon=True)
+            status_thread.start()
+
+            workers = [
+                threading.Thread(target=self.embed_worker, daemon=True) for _ in range(self.client.max_in_flight)
+            ]
+            for worker in workers:
+                worker.start()
+
+            # Producer: blocks while the work queue is full, which bounds how far ahead of the workers it reads.
+            try:
+                for batch in batched(sentences, self.client.batch_size):
+                    if not self._put(self.work_queue, (self.register_batch(batch), batch)):
+                        break
+            except Exception as e:  # noqa: BLE001 - raised below once the workers have stopped
+                self._abort(e)
+            for _ in workers:
+                self._put(self.work_queue, None)
+
+            for worker in workers:
+                worker.join()
+
+            self.stop_event.set()
+            status_thread.join()
+            self.db_thread.join()
 
-                # Submit tasks to the executor
-                futures = {executor.submit(self.process_sentence, sentence) for sentence in sentences}
+            set_job_status(conn, self.job.id, JOB_FAILED if self.error is not None else JOB_DONE)
 
-                # Ensure all futures are completed
-                for future in concurrent.futures.as_completed(futures):
-                    future.result()  # Retrieve any exception raised by the task
+        if self.error is not None:
+            raise self.error
 
-                # Signal the status thread to stop after processing
-                self.stop_event.set()
-                status_thread.join()
+        print(
+            f"Embedded {self.client.stats.embedded} sentences, reused {self.cached_sentences} cached embeddings. "
+            f"{self.client.stats.summary()}"
+        )
 
 
-def bytes_to_numpy_array(blob: bytes) -> np.ndarray:
-    return np.frombuffer(blob, dtype=np.float32)
+def bytes_to_numpy_array(blob: bytes, codec: str = CODEC_FLOAT32) -> np.ndarray:
+    return decode_embedding(blob, codec)
 
 
-def store_embeddings(db_path: Path, context_window: int = 2) -> None:
-    with SentenceProcessor(db_path, context_window=context_window) as processor:
+def store_embeddings(
+    db_path: Path,
+    context_window: int = 2,
+    batch_size: int = 32,
+    max_in_flight: int = 4,
+    max_retries: int = 3,
+    max_pending_batches: int = 8,
+    write_batch_size: int = 500,
+    flush_interval: float = 1.0,
+    resume: bool = False,
+) -> None:
+    with (
+        EmbeddingClient(batch_size=batch_size, max_in_flight=max_in_flight, max_retries=max_retries) as client,
+        SentenceProcessor(
+            db_path,
+            context_window=context_window,
+            client=client,
+            max_pending_batches=max_pending_batches,
+            write_batch_size=write_batch_size,
+            flush_interval=flush_interval,
+            resume=resume,
+        ) as processor,
+    ):
         processor.start_processing()
@@ -0,0 +1,97 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+
+JOB_RUNNING = "running"
+JOB_FAILED = "failed"
+JOB_DONE = "done"
+
+
+@dataclass
+class EmbeddingJob:
+    """A calc-embeddings run over the sentence id range [first_sentence_id, last_sentence_id].
+
+    Sentences are embedded in id order, and `checkpoint_sentence_id` is the highest id below which every sentence in
+    the range has been written, so a resumed run only has to look at ids after it.
+    """
+
+    id: int
+    model: str
+    context_window: int
+    status: str
+    first_sentence_id: int
+    last_sentence_id: int
+    checkpoint_sentence_id: int
+    total_sentences: int
+    processed_sentences: int
+    created_at: float
+    updated_at: float
+
+
+def job_factory(cursor: sqlite3.Cursor, row: tuple) -> EmbeddingJob:
+    fields = [column[0] for column in cursor.description]
+    return EmbeddingJob(**dict(zip(fields, row)))
+
+
+def create_job(conn: sqlite3.Connection, model: str, context_window: int) -> EmbeddingJob | None:
+    """Start a job covering every sentence currently missing an embedding, or return None if there are none."""
+    first_id, last_id, total = conn.execute(
+        "SELECT MIN(id), MAX(id), COUNT(*) FROM sentences WHERE embedding IS NULL"
+    ).fetchone()
+    if total == 0:
+        return None
+
+    now = time.time()
+    cursor = conn.execute(
+        """
+        INSERT INTO embedding_jobs (
+            model, context_window, status, first_sentence_id, last_sentence_id, checkpoint_sentence_id,
+            total_sentences, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (model, context_window, JOB_RUNNING, first_id, last_id, first_id - 1, total, now, now),
+    )
+    conn.commit()
+    return get_job(conn, cursor.lastrowid)  # type: ignore
+
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> EmbeddingJob:
+    cursor = conn.cursor()
+    cursor.row_factory = job_factory
+    cursor.execute("SELECT * FROM embedding_jobs WHERE id = ?", (job_id,))
+    return cursor.fetchone()
+
+
+def get_resumable_job(conn: sqlite3.Connection, model: str, context_window: int) -> EmbeddingJob | None:
+    """Return the most recent unfinished job for the same model and context window."""
+    cursor = conn.cursor()
+    cursor.row_factory = job_factory
+    cursor.execute(
+        """
+        SELECT * FROM embedding_jobs
+        WHERE model = ? AND context_window = ? AND status != ?
+        ORDER BY id DESC LIMIT 1
+        """,
+        (model, context_window, JOB_DONE),
+    )
+    return cursor.fetchone()
+
+
+def update_checkpoint(conn: sqlite3.Connection, job_id: int, checkpoint_sentence_id: int, processed: int) -> None:
+    """Advance the job's checkpoint; the caller commits, normally with the embeddings it covers."""
+    conn.execute(
+        """
+        UPDATE embedding_jobs
+        SET checkpoint_sentence_id = MAX(checkpoint_sentence_id, ?),
+            processed_sentences = processed_sentences + ?,
+            status = ?,
+            updated_at = ?
+        WHERE id = ?
+        """,
+        (checkpoint_sentence_id, processed, JOB_RUNNING, time.time(), job_id),
+    )
+
+
+def set_job_status(conn: sqlite3.Connection, job_id: int, status: str) -> None:
+    conn.execute("UPDATE embedding_jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+    conn.commit()
@@ -0,0 +1,145 @@
+import concurrent.futures
+import glob
+import multiprocessing
+import os
+import re
+import time
+import traceback
+from pathlib import Path
+
+from .db import get_db_connection
+from .models import Ebook
+from .parser import PreparedChapter, prepare_epub, segment_epub
+from .store import store_ebook
+from .utils import SEGMENTER_TRF, HTMLToText
+
+
+def find_epubs(source: str | Path) -> list[Path]:
+    """Expand a directory, searched recursively, or a glob pattern into a sorted list of EPUB paths."""
+    path = Path(source)
+    if path.is_dir():
+        return sorted(path.rglob("*.epub"))
+    return sorted(Path(match) for match in glob.glob(str(source), recursive=True) if match.lower().endswith(".epub"))
+
+
+def symbolic_name_for(epub_path: Path) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", epub_path.stem.lower()).strip("_")
+
+
+class LibraryProgress:
+    """Counts stored, skipped and failed books and prints one progress line per book."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.stored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.sentences = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def done(self) -> int:
+        return self.stored + self.skipped + self.failed
+
+    def books_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self, epub_path: Path, message: str) -> None:
+        rate = self.books_per_second()
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        print(f"[{self.done}/{self.total}] {epub_path.name}: {message} ({rate:.2f} books/sec, ETA {eta:.0f}s)")
+
+    def summary(self) -> str:
+        return (
+            f"Stored {self.stored} books with {self.sentences} sentences, skipped {self.skipped}, failed {self.failed}, "
+            f"{self.books_per_second():.2f} books/sec."
+        )
+
+
+def _prepare_book(epub_path: Path) -> tuple[Ebook, list[PreparedChapter]]:
+    # Each library worker converts a whole book, so its chapters are not spread over a nested pool.
+    return prepare_epub(epub_path, workers=1)
+
+
+def store_library(
+    db_path: Path,
+    epub_paths: list[Path],
+    workers: int | None = None,
+    segmenter: str = SEGMENTER_TRF,
+    spacy_batch_size: int = 32,
+    spacy_n_process: int = 1,
+    batch_size: int = 5000,
+    max_pending_books: int | None = None,
+) -> LibraryProgress:
+    """Parse and store many EPUBs in one long-lived process.
+
+    Books are converted to annotated text in a process pool while this process segments finished books with a single
+    loaded model and stores each one in its own transaction, so an interrupted run keeps every book it completed.
+    Books whose symbolic name is already in the database are skipped. At most `max_pending_books` converted books
+    wait for segmentation at a time.
+    """
+    progress = LibraryProgress(len(epub_paths))
+
+    with get_db_connection(db_path) as conn:
+        stored_names = {row[0] for row in conn.execute("SELECT symbolic_name FROM ebooks")}
+
+    pending: list[tuple[str, Path]] = []
+    for epub_path in epub_paths:
+        name = symbolic_name_for(epub_path)
+        if name in stored_names:
+            progress.skipped += 1
+            progress.report(epub_path, f"already stored as {name}")
+            continue
+        stored_names.add(name)
+        pending.append((name, epub_path))
+
+    if not pending:
+        return progress
+
+    html_to_text = HTMLToText(segmenter)
+
+    if workers is None:
+        workers = max(os.cpu_count() - 1, 1)  # type: ignore
+    workers = min(workers, len(pending))
+    if max_pending_books is None:
+        max_pending_books = 2 * workers
+
+    books = iter(pending)
+    # The segmenter model is already loaded in this process, with its threads running. Spawned workers start clean
+    # instead of forking those threads and copying the model's memory.
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures: dict[concurrent.futures.Future, tuple[str, Path]] = {}
+
+        def submit_next() -> None:
+            book = next(books, None)
+            if book is not None:
+                futures[executor.submit(_prepare_book, book[1])] = book
+
+        for _ in range(max_pending_books):
+            submit_next()
+
+        while futures:
+            done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name, epub_path = futures.pop(future)
+                submit_next()
+
+                try:
+                    ebook, prepared = future.result()
+                    segment_epub(ebook, prepared, html_to_text, batch_size=spacy_batch_size, n_process=spacy_n_process)
+                    store_ebook(db_path, ebook, name, batch_size=batch_size)
+                except Exception as e:  # noqa: BLE001
+                    # One broken book should not stop the rest of the library.
+                    traceback.print_exc()
+                    progress.failed += 1
+                    progress.report(epub_path, f"failed ({e})")
+                    continue
+
+                sentences = sum(len(chapter.sentences) for chapter in ebook.chapters)
+                progress.stored += 1
+                progress.sentences += sentences
+                progress.report(epub_path, f"stored as {name}, {len(ebook.chapters)} chapters, {sentences} sentences")
+
+    return progress
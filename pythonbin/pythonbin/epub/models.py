@@ -7,6 +7,8 @@ class Chapter:
     title: str
     raw_content: str
     sentences: List[str] = field(default_factory=list)
+    # Hash of the chapter's HTML in the EPUB, used to skip unchanged chapters when a book is stored again.
+    content_hash: str = ""
 
 
 @dataclass
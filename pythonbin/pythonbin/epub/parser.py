@@ -1,26 +1,51 @@
 import concurrent.futures
 import collections
+import hashlib
 import pathlib
 import os
+from collections.abc import Collection
 
-from bs4 import BeautifulSoup
+from ebooklib.utils import parse_html_string
+from lxml import etree
 
 import pythonbin.epub.vebooklib as vebooklib
 from .models import Ebook, Chapter, TocItem
-from .utils import SpacyModel, HTMLToText
+from .utils import SEGMENTER_TRF, Annotation, HTMLToText, annotate_html_tree
 
+PreparedChapter = tuple[Chapter, str, list[Annotation]]
 
-def read_epub(file_path: pathlib.Path) -> Ebook:
-    book = vebooklib.read_epub(str(file_path), options=dict(ignore_ncx=True))
-    title = book.get_metadata("DC", "title")[0][0]
-    ebook = Ebook(title=title)
 
-    # Extract the table of contents (TOC)
-    toc_items = _extract_toc(book)
-    chapters = _extract_chapters(book, toc_items)
-    ebook.chapters.extend(chapters)
+def read_epub(
+    file_path: pathlib.Path,
+    workers: int | None = None,
+    segmenter: str = SEGMENTER_TRF,
+    batch_size: int = 32,
+    n_process: int = 1,
+    known_hashes: Collection[str] = (),
+) -> Ebook:
+    ebook, prepared = prepare_epub(file_path, workers=workers, known_hashes=known_hashes)
+    return segment_epub(ebook, prepared, HTMLToText(segmenter), batch_size=batch_size, n_process=n_process)
 
-    return ebook
+
+def prepare_epub(
+    file_path: pathlib.Path, workers: int | None = None, known_hashes: Collection[str] = ()
+) -> tuple[Ebook, list[PreparedChapter]]:
+    """Read an EPUB and convert its chapters to annotated text, without splitting them into sentences yet.
+
+    With `workers=1` the chapters are converted in this process instead of a process pool. Chapters whose content hash
+    is in `known_hashes`, the hashes of the stored chapters, are returned without content, text or sentences.
+    """
+    # Items are read lazily, so images, fonts and other files the chapters don't need are never decompressed.
+    book = vebooklib.read_epub(str(file_path), options=dict(ignore_ncx=True, lazy=True))
+    try:
+        title = book.get_metadata("DC", "title")[0][0]
+        ebook = Ebook(title=title)
+
+        # Extract the table of contents (TOC)
+        toc_items = _extract_toc(book)
+        return ebook, _extract_chapters(book, toc_items, workers=workers, known_hashes=known_hashes)
+    finally:
+        book.close()
 
 
 def _extract_toc(book) -> list[TocItem]:
@@ -49,29 +74,36 @@ def _extract_toc(book) -> list[TocItem]:
     return toc_items
 
 
-def init_html_to_text():
-    global html_to_text
-    html_to_text = HTMLToText()
-
+def chapter_content_hash(raw_html: bytes) -> str:
+    return hashlib.blake2b(raw_html, digest_size=16).hexdigest()
 
-def _parse_chapter(toc_item: TocItem, book: vebooklib.EpubBook) -> Chapter:
-    print(f"Extracting chapter: {toc_item.title}")
 
-    book_item: vebooklib.EpubHtml = book.get_item_with_href(toc_item.filename)  # type: ignore
+def _prepare_chapter(title: str, raw_html: bytes) -> PreparedChapter:
+    """Convert one chapter to annotated text in a worker process.
 
-    content = book_item.get_body_content()
-    soup = BeautifulSoup(content, "lxml", from_encoding="utf-8")
+    The HTML is parsed once; the same body tree is serialized for `raw_content` and walked for the text.
+    """
+    print(f"Extracting chapter: {title}")
 
-    clean_content = soup.prettify()
-    chapter = Chapter(title=toc_item.title, raw_content=clean_content)
+    try:
+        body = parse_html_string(raw_html).find("body")
+    except (etree.ParserError, ValueError):
+        body = None
+    content_hash = chapter_content_hash(raw_html)
+    if body is None or len(body) == 0:
+        return Chapter(title=title, raw_content="", content_hash=content_hash), "", []
 
-    global html_to_text
-    chapter.sentences = html_to_text.html_to_sentences(clean_content)
+    raw_content = etree.tostring(body, encoding="unicode", method="html", pretty_print=True)
+    text, annotations = annotate_html_tree(body)
+    return Chapter(title=title, raw_content=raw_content, content_hash=content_hash), text, annotations
 
-    return chapter
 
-
-def _extract_chapters(book: vebooklib.EpubBook, toc_items: list[TocItem]) -> list[Chapter]:
+def _extract_chapters(
+    book: vebooklib.EpubBook,
+    toc_items: list[TocItem],
+    workers: int | None = None,
+    known_hashes: Collection[str] = (),
+) -> list[PreparedChapter]:
     seen_filenames: set[str] = set()
 
     # Filter out duplicate chapters
@@ -81,8 +113,59 @@ def _extract_chapters(book: vebooklib.EpubBook, toc_items: list[TocItem]) -> lis
         if toc_item.filename not in seen_filenames and not seen_filenames.add(toc_item.filename)
     ]
 
-    workers = max(os.cpu_count() - 1, 1)  # type: ignore
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, initializer=init_html_to_text) as executor:
-        chapters = list(executor.map(_parse_chapter, unique_toc_items, [book] * len(unique_toc_items)))
-
-    return chapters
+    # Only the chapter bytes are sent to the workers, the book itself stays in this process.
+    titles = [toc_item.title for toc_item in unique_toc_items]
+    contents = [_read_item_content(book, toc_item.filename) for toc_item in unique_toc_items]
+
+    # Chapters that are already stored are not converted again. Each stored chapter covers one chapter of the book,
+    # so a chapter whose identical copy is stored fewer times than it appears is still converted.
+    stored = collections.Counter(known_hashes)
+    prepared: list[PreparedChapter | None] = [None] * len(contents)
+    changed = []
+    for i, (title, content) in enumerate(zip(titles, contents)):
+        content_hash = chapter_content_hash(content)
+        if stored[content_hash] > 0:
+            stored[content_hash] -= 1
+            prepared[i] = Chapter(title=title, raw_content="", content_hash=content_hash), "", []
+        else:
+            changed.append(i)
+
+    if workers is None:
+        workers = max(os.cpu_count() - 1, 1)  # type: ignore
+    workers = min(workers, max(len(changed), 1))
+    changed_titles = [titles[i] for i in changed]
+    changed_contents = [contents[i] for i in changed]
+    if workers == 1:
+        results = list(map(_prepare_chapter, changed_titles, changed_contents))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_prepare_chapter, changed_titles, changed_contents))
+    for i, result in zip(changed, results):
+        prepared[i] = result
+    return prepared  # type: ignore
+
+
+def _read_item_content(book: vebooklib.EpubBook, href: str) -> bytes:
+    item = book.get_item_with_href(href)
+    content = item.get_content()  # type: ignore
+    item.release_content()  # type: ignore
+    return content
+
+
+def segment_epub(
+    ebook: Ebook, prepared: list[PreparedChapter], html_to_text: HTMLToText, batch_size: int = 32, n_process: int = 1
+) -> Ebook:
+    """Split prepared chapters into sentences and add them to `ebook`.
+
+    Segment every chapter of the book in one batched pass; with n_process > 1 spaCy runs the pipeline in its own
+    worker processes, each loading the model once. Passing the same `html_to_text` for many books keeps its model
+    loaded between them.
+    """
+    sentences = html_to_text.segment(
+        [(text, annotations) for _, text, annotations in prepared], batch_size=batch_size, n_process=n_process
+    )
+
+    for (chapter, _, _), chapter_sentences in zip(prepared, sentences):
+        chapter.sentences = chapter_sentences
+        ebook.chapters.append(chapter)
+    return ebook
@@ -0,0 +1,143 @@
+import sqlite3
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+from .embeddings import EMBEDDING_MODEL, calculate_embeddings
+
+EXPANSION_MODEL = "ollama/llama3"
+EXPANSION_SYSTEM_PROMPT = "Please generate a paragraph of text that answers the question."
+QUERY_PROMPT = "Represent this query for searching relevant passages: {query}"
+
+DEFAULT_CACHE_PATH = Path("~/.cache/pythonbin/epub-query-cache.db").expanduser()
+
+CACHE_EXPANSION = "expansion"
+CACHE_EMBEDDING = "embedding"
+
+
+class QueryCache:
+    """Persistent LRU cache of query expansions and embeddings keyed by (kind, model, prompt)."""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_entries: int = 10000):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_cache (
+                kind TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                value BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (kind, model, prompt)
+            )
+        """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_query_cache_last_used ON query_cache (last_used)")
+        self.conn.commit()
+        self.max_entries = max_entries
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, kind: str, model: str, prompt: str) -> bytes | None:
+        row = self.conn.execute(
+            "SELECT value FROM query_cache WHERE kind = ? AND model = ? AND prompt = ?", (kind, model, prompt)
+        ).fetchone()
+        if row is None:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return None
+
+        self.hits[kind] = self.hits.get(kind, 0) + 1
+        self.conn.execute(
+            "UPDATE query_cache SET last_used = ? WHERE kind = ? AND model = ? AND prompt = ?",
+            (time.time(), kind, model, prompt),
+        )
+        self.conn.commit()
+        return row[0]
+
+    def put(self, kind: str, model: str, prompt: str, value: bytes) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO query_cache (kind, model, prompt, value, last_used) VALUES (?, ?, ?, ?, ?)",
+            (kind, model, prompt, value, time.time()),
+        )
+        # Evict the least recently used entries beyond max_entries.
+        self.conn.execute(
+            """
+            DELETE FROM query_cache WHERE rowid IN (
+                SELECT rowid FROM query_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        self.conn.commit()
+
+    def get_or_compute(self, kind: str, model: str, prompt: str, compute: Callable[[], bytes]) -> bytes:
+        value = self.get(kind, model, prompt)
+        if value is None:
+            value = compute()
+            self.put(kind, model, prompt, value)
+        return value
+
+    def summary(self) -> str:
+        kinds = sorted(set(self.hits) | set(self.misses))
+        return ", ".join(f"{kind} {self.hits.get(kind, 0)} hits/{self.misses.get(kind, 0)} misses" for kind in kinds)
+
+
+def expand_query(query: str, model: str = EXPANSION_MODEL) -> str:
+    # Imported here so that searches with --no-expand do not pay for importing litellm.
+    from litellm import completion
+
+    response = completion(
+        model=model,
+        messages=[
+            {"role": "system", "content": EXPANSION_SYSTEM_PROMPT},
+            {"role": "user", "content": query},
+        ],
+        api_base="http://localhost:11434",
+    )
+    result = response.choices[0].message.content
+    return result
+
+
+def get_query_embedding(
+    query: str,
+    expand: bool = True,
+    cache: QueryCache | None = None,
+    expansion_model: str = EXPANSION_MODEL,
+    embedding_model: str = EMBEDDING_MODEL,
+) -> np.ndarray:
+    """Optionally expand the query with an LLM, then embed it, reusing cached results for both steps."""
+    print(f"Original query: {query}")
+    if expand:
+        if cache is None:
+            query = expand_query(query, expansion_model)
+        else:
+            expansion_prompt = f"{EXPANSION_SYSTEM_PROMPT}\n\n{query}"
+            query = cache.get_or_compute(
+                CACHE_EXPANSION,
+                expansion_model,
+                expansion_prompt,
+                lambda: expand_query(query, expansion_model).encode(),
+            ).decode()
+        print(f"Expanded query: {query}")
+
+    prompt = QUERY_PROMPT.format(query=query)
+    if cache is None:
+        embedding = calculate_embeddings(prompt, embedding_model)
+    else:
+        embedding = cache.get_or_compute(
+            CACHE_EMBEDDING, embedding_model, prompt, lambda: calculate_embeddings(prompt, embedding_model)
+        )
+    return np.frombuffer(embedding, dtype=np.float32)
@@ -1,49 +1,25 @@
 #!/usr/bin/env python3
 
 import os
-import subprocess
+
+from pythonbin.epub.cli import main as cli_main
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "ebooks.db")
+LIBRARY = "/Users/asimi/Library/CloudStorage/Dropbox-TeamChasima/Asim Ihsan/Private/Ebooks/InformIT/Understanding Software Dynamics.epub"
 
 
 def main() -> None:
+    # Every step runs in this process instead of a separate `poetry run`, so the interpreter starts once.
+
     # Initialize the database
-    subprocess.run(["poetry", "run", "python", "-m", "pythonbin.epub.cli", "init-db", "--db-path", DB_PATH], check=True)
-
-    # Store an EPUB file
-    subprocess.run(
-        [
-            "poetry",
-            "run",
-            "python",
-            "-m",
-            "pythonbin.epub.cli",
-            "store-ebook",
-            "--db-path",
-            DB_PATH,
-            "--epub-path",
-            "/Users/asimi/Library/CloudStorage/Dropbox-TeamChasima/Asim Ihsan/Private/Ebooks/InformIT/Understanding Software Dynamics.epub",
-            "--symbolic-name",
-            "understanding_software_dynamics",
-        ],
-        check=True,
-    )
+    cli_main(["init-db", "--db-path", DB_PATH])
+
+    # Store the EPUB files, a directory or glob stores a whole library
+    cli_main(["store-library", "--db-path", DB_PATH, "--library", LIBRARY])
 
     # Calculate embeddings
-    subprocess.run(
-        [
-            "poetry",
-            "run",
-            "python",
-            "-m",
-            "pythonbin.epub.cli",
-            "calc-embeddings",
-            "--db-path",
-            DB_PATH,
-        ],
-        check=True,
-    )
+    cli_main(["calc-embeddings", "--db-path", DB_PATH])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+import os
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .codec import decode_embeddings, get_embedding_codec
+from .db import EMBEDDINGS_VERSION_SETTING, get_setting, table_exists
+from .store import get_sentence_context
+
+# Rows fetched per round trip when loading embeddings.
+FETCH_SIZE = 10000
+
+SEARCH_VECTOR = "vector"
+SEARCH_LEXICAL = "lexical"
+SEARCH_HYBRID = "hybrid"
+SEARCH_MODES = [SEARCH_VECTOR, SEARCH_LEXICAL, SEARCH_HYBRID]
+
+# Constant of reciprocal rank fusion, damping the weight of the first few ranks of each list.
+RRF_K = 60
+
+
+@dataclass
+class SearchResult:
+    sentence_id: int
+    score: float
+    sentence_context: str = ""
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def load_embeddings(conn: sqlite3.Connection, sql: str, *args) -> tuple[np.ndarray, np.ndarray]:
+    """Load (sentence id, embedding) rows into an id array and a contiguous, L2-normalized float32 matrix."""
+    codec = get_embedding_codec(conn)
+    cursor = conn.execute(sql, args)
+    ids: list[int] = []
+    chunks: list[np.ndarray] = []
+    while rows := cursor.fetchmany(FETCH_SIZE):
+        ids.extend(row[0] for row in rows)
+        chunks.append(decode_embeddings([row[1] for row in rows], codec))
+
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    return np.array(ids, dtype=np.int64), normalize_rows(np.concatenate(chunks))
+
+
+def load_all_embeddings(conn: sqlite3.Connection) -> tuple[np.ndarray, np.ndarray]:
+    return load_embeddings(conn, "SELECT id, embedding FROM sentences WHERE embedding IS NOT NULL ORDER BY id")
+
+
+def embedding_matrix_paths(db_file: str, version: str) -> tuple[Path, Path]:
+    return Path(f"{db_file}.embedding-ids-{version}.npy"), Path(f"{db_file}.embeddings-{version}.npy")
+
+
+def save_array(path: Path, array: np.ndarray) -> None:
+    # Written under a temporary name and renamed, so a concurrent search never maps a partial file.
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(tmp_path, path)
+
+
+def load_embedding_matrix(conn: sqlite3.Connection) -> tuple[np.ndarray, np.ndarray]:
+    """Like `load_all_embeddings`, but memory-maps the matrix from a file next to the database.
+
+    The ids and normalized matrix are saved as .npy files named after the embeddings_version setting, which changes
+    whenever stored embeddings change, so they are rebuilt from the table only then. Files of older versions are
+    removed. In-memory databases, and databases without the setting, read the table every time.
+    """
+    db_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    version = get_setting(conn, EMBEDDINGS_VERSION_SETTING, "")
+    if not db_file or not version:
+        return load_all_embeddings(conn)
+
+    ids_path, matrix_path = embedding_matrix_paths(db_file, version)
+    if not (ids_path.exists() and matrix_path.exists()):
+        ids, matrix = load_all_embeddings(conn)
+        if len(ids) == 0:
+            return ids, matrix
+        for stale_path in Path(db_file).parent.glob(f"{Path(db_file).name}.embedding*.npy"):
+            stale_path.unlink(missing_ok=True)
+        save_array(matrix_path, matrix)
+        save_array(ids_path, ids)
+    return np.load(ids_path), np.load(matrix_path, mmap_mode="r")
+
+
+def top_k(ids: np.ndarray, matrix: np.ndarray, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+    """Return the k (id, cosine similarity) pairs closest to `query`, best first."""
+    if len(ids) == 0:
+        return []
+    query = query / (np.linalg.norm(query) or 1.0)
+    scores = matrix @ query.astype(np.float32)
+    k = min(k, len(scores))
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    best = candidates[np.argsort(-scores[candidates])]
+    return [(int(ids[i]), float(scores[i])) for i in best]
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over L2-normalized rows, returning normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=n_clusters, replace=False)]
+    for _ in range(n_iter):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Re-seed empty clusters from random points so every list stays in use.
+        empty = counts == 0
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def create_ivf_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ivf_centroids (
+            id INTEGER PRIMARY KEY,
+            centroid BLOB NOT NULL
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ivf_lists (
+            sentence_id INTEGER PRIMARY KEY,
+            list_id INTEGER NOT NULL,
+            FOREIGN KEY (sentence_id) REFERENCES sentences (id),
+            FOREIGN KEY (list_id) REFERENCES ivf_centroids (id)
+        )
+    """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ivf_lists_list ON ivf_lists (list_id)")
+
+
+def build_ivf_index(
+    conn: sqlite3.Connection, n_lists: int | None = None, n_iter: int = 20, max_training_points: int = 100000
+) -> int:
+    """Cluster the stored embeddings with k-means and persist the centroids and inverted lists.
+
+    Returns the number of lists. Defaults to roughly sqrt(n) lists for n embeddings, and is at most the number of
+    points k-means is trained on.
+    """
+    ids, matrix = load_all_embeddings(conn)
+    if len(ids) == 0:
+        raise ValueError("No embeddings to index, run calc-embeddings first")
+
+    n_lists = n_lists or max(1, int(np.sqrt(len(ids))))
+    # k-means needs at least one training point per list.
+    n_training = min(len(ids), max_training_points)
+    if n_lists > n_training:
+        print(f"Reducing the number of IVF lists from {n_lists} to {n_training}, the number of training points.")
+        n_lists = n_training
+    rng = np.random.default_rng(0)
+    training = matrix[rng.choice(len(ids), size=n_training, replace=False)]
+    centroids = kmeans(training, n_lists, n_iter=n_iter)
+    assignments = np.argmax(matrix @ centroids.T, axis=1)
+
+    create_ivf_tables(conn)
+    conn.execute("DELETE FROM ivf_lists")
+    conn.execute("DELETE FROM ivf_centroids")
+    conn.executemany(
+        "INSERT INTO ivf_centroids (id, centroid) VALUES (?, ?)",
+        [(i, centroid.astype(np.float32).tobytes()) for i, centroid in enumerate(centroids)],
+    )
+    conn.executemany(
+        "INSERT INTO ivf_lists (sentence_id, list_id) VALUES (?, ?)",
+        zip(ids.tolist(), assignments.tolist()),
+    )
+    conn.commit()
+    return n_lists
+
+
+def has_ivf_index(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ivf_centroids'").fetchone()
+    return row is not None and conn.execute("SELECT 1 FROM ivf_centroids LIMIT 1").fetchone() is not None
+
+
+def search_ivf(conn: sqlite3.Connection, query: np.ndarray, k: int, n_probe: int = 8) -> list[tuple[int, float]]:
+    """Search only the `n_probe` lists whose centroids are closest to the query.
+
+    Sentences embedded after the index was built are not in any list yet and are always searched.
+    """
+    centroid_rows = conn.execute("SELECT id, centroid FROM ivf_centroids ORDER BY id").fetchall()
+    centroid_ids = np.array([row[0] for row in centroid_rows])
+    centroids = np.frombuffer(b"".join(row[1] for row in centroid_rows), dtype=np.float32).reshape(
+        len(centroid_rows), -1
+    )
+    query = query / (np.linalg.norm(query) or 1.0)
+    probes = centroid_ids[np.argsort(-(centroids @ query))[:n_probe]].tolist()
+
+    placeholders = ",".join("?" * len(probes))
+    ids, matrix = load_embeddings(
+        conn,
+        f"""
+        SELECT s.id, s.embedding FROM ivf_lists l JOIN sentences s ON s.id = l.sentence_id
+        WHERE l.list_id IN ({placeholders}) AND s.embedding IS NOT NULL
+        UNION ALL
+        SELECT s.id, s.embedding FROM sentences s LEFT JOIN ivf_lists l ON l.sentence_id = s.id
+        WHERE l.sentence_id IS NULL AND s.embedding IS NOT NULL
+        """,
+        *probes,
+    )
+    return top_k(ids, matrix, query, k)
+
+
+def search_vector(
+    conn: sqlite3.Connection, query: np.ndarray, k: int, use_ivf: bool = False, n_probe: int = 8
+) -> list[tuple[int, float]]:
+    if use_ivf and has_ivf_index(conn):
+        return search_ivf(conn, query, k, n_probe=n_probe)
+    if use_ivf:
+        print("No IVF index found, falling back to brute-force search. Run build-ivf to create one.")
+    ids, matrix = load_embedding_matrix(conn)
+    return top_k(ids, matrix, query, k)
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching any of its words.
+
+    Each word is quoted, so operators like AND or NEAR in the text are searched for literally.
+    """
+    return " OR ".join(f'"{token}"' for token in re.findall(r"\w+", text))
+
+
+def search_fts(conn: sqlite3.Connection, query: str, k: int) -> list[tuple[int, float]]:
+    """BM25 top-k over the full-text index, best first. Scores are negated BM25, so higher is better."""
+    if not table_exists(conn, "sentences_fts"):
+        raise ValueError("No full-text index found, run init-db to create it")
+    match = fts_query(query)
+    if not match:
+        return []
+    rows = conn.execute(
+        "SELECT rowid, bm25(sentences_fts) FROM sentences_fts WHERE sentences_fts MATCH ? ORDER BY rank LIMIT ?",
+        (match, k),
+    )
+    return [(sentence_id, -score) for sentence_id, score in rows]
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[tuple[int, float]]], k: int, rrf_k: int = RRF_K
+) -> list[tuple[int, float]]:
+    """Fuse ranked (id, score) lists by summing 1 / (rrf_k + rank) per id; only ranks matter, not the scores."""
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (sentence_id, _) in enumerate(ranking, start=1):
+            fused[sentence_id] = fused.get(sentence_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def to_search_results(
+    conn: sqlite3.Connection, matches: list[tuple[int, float]], context_window: int = 2
+) -> list[SearchResult]:
+    results = []
+    for sentence_id, score in matches:
+        chapter_id, sentence_index = conn.execute(
+            "SELECT chapter_id, sentence_index FROM sentences WHERE id = ?", (sentence_id,)
+        ).fetchone()
+        context = get_sentence_context(conn, chapter_id, sentence_index, context_window)
+        results.append(SearchResult(sentence_id=sentence_id, score=score, sentence_context=context))
+    return results
+
+
+def search_sqlite(
+    conn: sqlite3.Connection,
+    query: np.ndarray,
+    k: int = 10,
+    use_ivf: bool = False,
+    n_probe: int = 8,
+    context_window: int = 2,
+) -> list[SearchResult]:
+    """Cosine top-k search over the embeddings in the sentences table, exact unless `use_ivf` is set."""
+    matches = search_vector(conn, query, k, use_ivf=use_ivf, n_probe=n_probe)
+    return to_search_results(conn, matches, context_window)
+
+
+def search_lexical(conn: sqlite3.Connection, query: str, k: int = 10, context_window: int = 2) -> list[SearchResult]:
+    """BM25 search over the full-text index, without embedding the query."""
+    return to_search_results(conn, search_fts(conn, query, k), context_window)
+
+
+def search_hybrid(
+    conn: sqlite3.Connection,
+    query: str,
+    query_embedding: np.ndarray,
+    k: int = 10,
+    use_ivf: bool = False,
+    n_probe: int = 8,
+    context_window: int = 2,
+    n_candidates: int = 50,
+    rrf_k: int = RRF_K,
+) -> list[SearchResult]:
+    """Fuse the `n_candidates` best BM25 and vector matches with reciprocal rank fusion.
+
+    BM25 scores and cosine similarities are not comparable, so only the ranks are fused. Sentences found by both
+    searches rank above sentences found by one. Result scores are the fused RRF scores.
+    """
+    n_candidates = max(n_candidates, k)
+    lexical = search_fts(conn, query, n_candidates)
+    vector = search_vector(conn, query_embedding, n_candidates, use_ivf=use_ivf, n_probe=n_probe)
+    return to_search_results(conn, reciprocal_rank_fusion([lexical, vector], k, rrf_k=rrf_k), context_window)
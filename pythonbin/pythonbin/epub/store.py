@@ -1,37 +1,111 @@
+import collections
+import functools
+import itertools
 import sqlite3
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Iterable
 
 import numpy as np
 
 from .models import Ebook, Chapter
-from .db import get_db_connection, execute_sql
+from .codec import CODEC_FLOAT32, decode_embedding, get_embedding_codec
+from .db import get_db_connection, transaction, bulk_fts_insert, create_indexes, drop_indexes, ensure_schema
 
+MAX_SENTENCE_ID = 2**63 - 1
 
-def store_ebook(db_path: Path, ebook: Ebook, symbolic_name: str):
+INSERT_SENTENCE_SQL = "INSERT INTO sentences (chapter_id, sentence_index, sentence) VALUES (?, ?, ?)"
+
+
+def store_ebook(
+    db_path: Path, ebook: Ebook, symbolic_name: str, batch_size: int = 5000, defer_index: bool = False
+) -> int:
+    """Store an ebook in a single transaction, inserting sentences in batches of `batch_size`.
+
+    If a book with the same symbolic name is already stored, chapters whose content hash is unchanged keep their rows,
+    and with them their sentence ids and embeddings. Changed chapters are inserted after every existing sentence, so
+    sentence ids keep increasing in chapter order, and chapters that are no longer in the book are deleted.
+
+    With `defer_index` the sentence indexes are dropped for the duration of the load and rebuilt once at the end,
+    which is faster for large initial loads but rebuilds the indexes over the whole table.
+    """
     with get_db_connection(db_path) as conn:
-        ebook_id = execute_sql(
-            conn, "INSERT INTO ebooks (title, symbolic_name) VALUES (?, ?)", ebook.title, symbolic_name
+        ensure_schema(conn)
+
+        with transaction(conn), bulk_fts_insert(conn):
+            if defer_index:
+                drop_indexes(conn)
+
+            cursor = conn.cursor()
+            row = cursor.execute("SELECT id FROM ebooks WHERE symbolic_name = ?", (symbolic_name,)).fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO ebooks (title, symbolic_name) VALUES (?, ?)", (ebook.title, symbolic_name))
+                ebook_id = cursor.lastrowid
+            else:
+                ebook_id = row[0]
+                cursor.execute("UPDATE ebooks SET title = ? WHERE id = ?", (ebook.title, ebook_id))
+
+            # Stored chapters by content hash, in order, so repeated identical chapters are matched one to one.
+            stored_chapters: dict[str, collections.deque[int]] = collections.defaultdict(collections.deque)
+            for chapter_id, content_hash in cursor.execute(
+                "SELECT id, content_hash FROM chapters WHERE ebook_id = ? ORDER BY id", (ebook_id,)
+            ).fetchall():
+                stored_chapters[content_hash].append(chapter_id)
+
+            kept = 0
+            batch: list[tuple[int, int, str]] = []
+            for chapter_index, chapter in enumerate(ebook.chapters):
+                if chapter.content_hash and stored_chapters.get(chapter.content_hash):
+                    cursor.execute(
+                        "UPDATE chapters SET title = ?, chapter_index = ? WHERE id = ?",
+                        (chapter.title, chapter_index, stored_chapters[chapter.content_hash].popleft()),
+                    )
+                    kept += 1
+                    continue
+
+                cursor.execute(
+                    "INSERT INTO chapters (ebook_id, title, raw_content, content_hash, chapter_index) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (ebook_id, chapter.title, chapter.raw_content, chapter.content_hash, chapter_index),
+                )
+                chapter_id = cursor.lastrowid
+
+                for index, sentence in enumerate(chapter.sentences):
+                    batch.append((chapter_id, index, sentence))
+                    if len(batch) >= batch_size:
+                        cursor.executemany(INSERT_SENTENCE_SQL, batch)
+                        batch.clear()
+
+            if batch:
+                cursor.executemany(INSERT_SENTENCE_SQL, batch)
+
+            removed = [(chapter_id,) for chapter_ids in stored_chapters.values() for chapter_id in chapter_ids]
+            cursor.executemany("DELETE FROM sentences WHERE chapter_id = ?", removed)
+            cursor.executemany("DELETE FROM chapters WHERE id = ?", removed)
+
+            if defer_index:
+                create_indexes(conn)
+
+    if row is not None:
+        print(
+            f"Kept {kept} unchanged chapters, stored {len(ebook.chapters) - kept} changed chapters, "
+            f"removed {len(removed)} chapters."
         )
+    return ebook_id  # type: ignore
 
-        for chapter in ebook.chapters:
-            chapter_id = execute_sql(
-                conn,
-                "INSERT INTO chapters (ebook_id, title, raw_content) VALUES (?, ?, ?)",
-                ebook_id,
-                chapter.title,
-                chapter.raw_content,
-            )
 
-            for index, sentence in enumerate(chapter.sentences):
-                execute_sql(
-                    conn,
-                    "INSERT INTO sentences (chapter_id, sentence_index, sentence) VALUES (?, ?, ?)",
-                    chapter_id,
-                    index,
-                    sentence,
-                )
+def get_chapter_hashes(db_path: Path, symbolic_name: str) -> list[str]:
+    """Content hashes of the chapters stored for a book, one per chapter, empty if the book is not stored yet."""
+    if not db_path.exists():
+        return []
+    with get_db_connection(db_path) as conn:
+        ensure_schema(conn)
+        rows = conn.execute(
+            "SELECT c.content_hash FROM chapters c JOIN ebooks e ON e.id = c.ebook_id "
+            "WHERE e.symbolic_name = ? AND c.content_hash IS NOT NULL ORDER BY c.id",
+            (symbolic_name,),
+        )
+        return [row[0] for row in rows]
 
 
 @dataclass
@@ -42,16 +116,21 @@ class Sentence:
     sentence: str
     embedding: bytes
     sentence_context: str = ""
+    codec: str = CODEC_FLOAT32
+
+    @property
+    def embedding_array(self) -> np.ndarray:
+        return decode_embedding(self.embedding, self.codec)
 
     @property
     def embedding_list(self) -> list[float]:
-        return np.frombuffer(self.embedding, dtype=np.float32).tolist()
+        return self.embedding_array.tolist()
 
 
-def sentence_factory(cursor: sqlite3.Cursor, row: tuple) -> Sentence:
+def sentence_factory(cursor: sqlite3.Cursor, row: tuple, codec: str = CODEC_FLOAT32) -> Sentence:
     fields = [column[0] for column in cursor.description]
     row_dict = {field: value for field, value in zip(fields, row)}
-    return Sentence(**row_dict)
+    return Sentence(**row_dict, codec=codec)
 
 
 def get_total_sentences(conn: sqlite3.Connection, embedding_missing: bool = False) -> int:
@@ -79,19 +158,67 @@ def get_sentence_context(conn: sqlite3.Connection, chapter_id: int, sentence_ind
 
 
 def get_all_sentences(
-    conn, embedding_missing: bool = False, context_window: int = 2
+    conn,
+    embedding_missing: bool = False,
+    context_window: int = 2,
+    after_id: int = 0,
+    until_id: int = MAX_SENTENCE_ID,
 ) -> Generator[Sentence, None, None]:
+    """Yield sentences with their +/- `context_window` context in a single ordered pass over the table.
+
+    With `embedding_missing`, only sentences without an embedding whose id is in (after_id, until_id] are yielded.
+    """
     cursor = conn.cursor()
-    cursor.row_factory = sentence_factory
+    cursor.row_factory = functools.partial(sentence_factory, codec=get_embedding_codec(conn))
 
     if embedding_missing:
-        cursor.execute("SELECT * FROM sentences WHERE embedding IS NULL")
-    else:
-        cursor.execute("SELECT * FROM sentences")
-
-    for row in cursor:
-        sentence = row
-        sentence.sentence_context = get_sentence_context(
-            conn, sentence.chapter_id, sentence.sentence_index, context_window
+        # Context may include sentences that already have embeddings, so read every chapter that has a missing one.
+        cursor.execute(
+            """
+            SELECT * FROM sentences
+            WHERE chapter_id IN (
+                SELECT DISTINCT chapter_id FROM sentences WHERE embedding IS NULL AND id > ? AND id <= ?
+            )
+            ORDER BY chapter_id, sentence_index
+            """,
+            (after_id, until_id),
         )
-        yield sentence
+        sentences = with_sentence_context(cursor, context_window)
+        yield from (
+            sentence for sentence in sentences if sentence.embedding is None and after_id < sentence.id <= until_id
+        )
+    else:
+        cursor.execute("SELECT * FROM sentences ORDER BY chapter_id, sentence_index")
+        yield from with_sentence_context(cursor, context_window)
+
+
+def with_sentence_context(sentences: Iterable[Sentence], window_size: int) -> Generator[Sentence, None, None]:
+    """Fill in `sentence_context` using a sliding window over sentences ordered by chapter and index.
+
+    Only the last 2 * window_size + 1 sentences of the current chapter are held in memory.
+    """
+    for _, chapter_sentences in itertools.groupby(sentences, key=lambda sentence: sentence.chapter_id):
+        window: collections.deque[Sentence] = collections.deque(maxlen=2 * window_size + 1)
+        seen = 0
+
+        for sentence in chapter_sentences:
+            window.append(sentence)
+            seen += 1
+            # The sentence window_size positions back now has its full right-hand context.
+            if seen > window_size:
+                centre = window[-(window_size + 1)]
+                centre.sentence_context = _join_context(window)
+                yield centre
+
+        # Flush the trailing sentences of the chapter, whose right-hand context is cut short.
+        window_list = list(window)
+        offset = seen - len(window_list)
+        for position in range(max(0, seen - window_size), seen):
+            start = max(0, position - window_size) - offset
+            sentence = window_list[position - offset]
+            sentence.sentence_context = _join_context(window_list[start:])
+            yield sentence
+
+
+def _join_context(sentences: Iterable[Sentence]) -> str:
+    return " ".join(sentence.sentence for sentence in sentences)
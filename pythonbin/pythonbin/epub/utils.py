@@ -1,30 +1,134 @@
+import re
+from typing import Protocol
+
 from inscriptis import get_annotated_text, ParserConfig
+from inscriptis.html_engine import Inscriptis
 import spacy
 from intervaltree import IntervalTree
 import numpy as np
 
+from .codec import CODEC_FLOAT32, decode_embedding
 
-def bytes_to_numpy_array(blob: bytes) -> np.ndarray:
-    return np.frombuffer(blob, dtype=np.float32)
+SEGMENTER_TRF = "trf"
+SEGMENTER_SM = "sm"
+SEGMENTER_SENTENCIZER = "sentencizer"
+SEGMENTER_REGEX = "regex"
+SEGMENTERS = (SEGMENTER_TRF, SEGMENTER_SM, SEGMENTER_SENTENCIZER, SEGMENTER_REGEX)
 
+SPACY_MODELS = {
+    SEGMENTER_TRF: "en_core_web_trf",
+    SEGMENTER_SM: "en_core_web_sm",
+}
 
-class HTMLToText:
-    def __init__(self, model_name="en_core_web_trf"):
-        self.spacy_model = SpacyModel(model_name)
+# Pipeline components that do not contribute to sentence boundaries.
+NON_SENTENCE_COMPONENTS = ["tagger", "morphologizer", "attribute_ruler", "lemmatizer", "ner"]
 
-    def html_to_sentences(self, html: str) -> list[str]:
-        annotation_rules = {"pre": ["pre"]}
-        config = ParserConfig(annotation_rules=annotation_rules)
-        annotated_text = get_annotated_text(html, config)
-        text = annotated_text["text"]
+Annotation = tuple[int, int, str]
+Span = tuple[int, int]
 
-        annotations = annotated_text["label"]
-        pre_intervals = self.build_interval_tree(annotations)
 
-        doc = self.spacy_model.process_text(text)
-        sentences = self.merge_sentences_with_pre(doc, pre_intervals)
+def bytes_to_numpy_array(blob: bytes, codec: str = CODEC_FLOAT32) -> np.ndarray:
+    return decode_embedding(blob, codec)
 
-        return sentences
+
+def annotate_html(html: str) -> tuple[str, list[Annotation]]:
+    """Convert HTML to text, returning the text and the character spans of its `pre` blocks."""
+    annotated_text = get_annotated_text(html, pre_annotation_config())
+    return annotated_text["text"], annotated_text["label"]
+
+
+# Elements whose text must not run into the text next to them. Some, like dt and dd, are rendered inline by inscriptis.
+BLOCK_ELEMENTS = frozenset(
+    [
+        "address", "article", "aside", "blockquote", "caption", "dd", "div", "dl", "dt", "figcaption", "figure",
+        "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "nav", "ol", "p", "section", "table", "tbody",
+        "td", "tfoot", "th", "thead", "tr", "ul",
+    ]
+)  # fmt: skip
+
+
+def separate_blocks(html_tree) -> None:
+    """Add a line feed after every block element outside `pre`, so adjacent blocks never share a word."""
+    for element in html_tree.iter():
+        if not isinstance(element.tag, str) or element.tag not in BLOCK_ELEMENTS:
+            continue
+        if any(ancestor.tag == "pre" for ancestor in element.iterancestors()):
+            continue
+        element.tail = "\n" + (element.tail or "")
+
+
+def annotate_html_tree(html_tree) -> tuple[str, list[Annotation]]:
+    """Like `annotate_html`, but for an already parsed lxml tree, which gets line feeds added after its blocks."""
+    separate_blocks(html_tree)
+    inscriptis = Inscriptis(html_tree, pre_annotation_config())
+    annotations = [(a.start, a.end, a.metadata) for a in inscriptis.get_annotations()]
+    return inscriptis.get_text(), annotations
+
+
+def pre_annotation_config() -> ParserConfig:
+    annotation_rules = {"pre": ["pre"]}
+    return ParserConfig(annotation_rules=annotation_rules)
+
+
+class Segmenter(Protocol):
+    def split(self, texts: list[str], batch_size: int = 32, n_process: int = 1) -> list[list[Span]]:
+        """Return the (start_char, end_char) span of every sentence in each text."""
+        ...
+
+
+class SpacySegmenter:
+    def __init__(self, segmenter: str = SEGMENTER_TRF):
+        self.spacy_model = SpacyModel(segmenter)
+
+    def split(self, texts: list[str], batch_size: int = 32, n_process: int = 1) -> list[list[Span]]:
+        docs = self.spacy_model.process_texts(texts, batch_size=batch_size, n_process=n_process)
+        return [[(sent.start_char, sent.end_char) for sent in doc.sents] for doc in docs]
+
+
+class RegexSegmenter:
+    """Splits after sentence-ending punctuation followed by a likely sentence start, and at blank lines."""
+
+    boundary_pattern = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])|\n\s*\n")
+
+    def split(self, texts: list[str], batch_size: int = 32, n_process: int = 1) -> list[list[Span]]:
+        return [self.split_text(text) for text in texts]
+
+    def split_text(self, text: str) -> list[Span]:
+        spans = []
+        start = 0
+        for match in self.boundary_pattern.finditer(text):
+            spans.append((start, match.start()))
+            start = match.end()
+        if start < len(text):
+            spans.append((start, len(text)))
+        return spans
+
+
+def get_segmenter(segmenter: str = SEGMENTER_TRF) -> Segmenter:
+    if segmenter == SEGMENTER_REGEX:
+        return RegexSegmenter()
+    if segmenter in (SEGMENTER_TRF, SEGMENTER_SM, SEGMENTER_SENTENCIZER):
+        return SpacySegmenter(segmenter)
+    raise ValueError(f"Unknown segmenter: {segmenter}")
+
+
+class HTMLToText:
+    def __init__(self, segmenter: str = SEGMENTER_TRF):
+        self.segmenter = get_segmenter(segmenter)
+
+    def html_to_sentences(self, html: str) -> list[str]:
+        return self.segment([annotate_html(html)])[0]
+
+    def segment(
+        self, annotated_texts: list[tuple[str, list[Annotation]]], batch_size: int = 32, n_process: int = 1
+    ) -> list[list[str]]:
+        """Split many annotated texts into sentences with one batched pass through the segmenter."""
+        texts = [text for text, _ in annotated_texts]
+        spans = self.segmenter.split(texts, batch_size=batch_size, n_process=n_process)
+        return [
+            self.merge_sentences_with_pre(text, text_spans, self.build_interval_tree(annotations))
+            for text, text_spans, (_, annotations) in zip(texts, spans, annotated_texts)
+        ]
 
     def build_interval_tree(self, annotations) -> IntervalTree:
         tree = IntervalTree()
@@ -33,22 +137,23 @@ class HTMLToText:
                 tree[start:end] = label
         return tree
 
-    def merge_sentences_with_pre(self, doc, pre_intervals) -> list[str]:
+    def merge_sentences_with_pre(self, text: str, spans: list[Span], pre_intervals) -> list[str]:
         sentences = []
         current_sentence = []
 
-        sents = (sent for sent in doc.sents if len(sent.text.strip()) > 0)
+        sents = ((start, end) for start, end in spans if len(text[start:end].strip()) > 0)
 
-        for sent in sents:
-            if not pre_intervals.overlaps(sent.start_char, sent.end_char):
+        for start, end in sents:
+            sentence = text[start:end].strip()
+            if not pre_intervals.overlaps(start, end):
                 if current_sentence:
                     sentences.append(" ".join(current_sentence))
                     current_sentence = []
 
-                sentences.append(sent.text.strip())
+                sentences.append(sentence)
                 continue
 
-            current_sentence.append(sent.text.strip())
+            current_sentence.append(sentence)
 
         if current_sentence:
             sentences.append(" ".join(current_sentence))
@@ -57,16 +162,33 @@ class HTMLToText:
 
 
 class SpacyModel:
-    def __init__(self, model_name="en_core_web_trf"):
-        self.model_name = model_name
+    """Loads a spaCy pipeline trimmed down to what sentence segmentation needs.
+
+    `trf` uses the transformer model's dependency parser for sentence boundaries, `sm` the small model's statistical
+    `senter` without loading its parser, and `sentencizer` spaCy's rule-based sentencizer on a blank pipeline.
+    """
+
+    def __init__(self, segmenter: str = SEGMENTER_TRF):
+        self.segmenter = segmenter
         self.nlp = None
         self.load_model()
 
     def load_model(self):
         if self.nlp is None:
-            self.nlp = spacy.load(self.model_name)
+            if self.segmenter == SEGMENTER_SENTENCIZER:
+                self.nlp = spacy.blank("en")
+                self.nlp.add_pipe("sentencizer")
+            elif self.segmenter == SEGMENTER_SM:
+                self.nlp = spacy.load(SPACY_MODELS[SEGMENTER_SM], exclude=NON_SENTENCE_COMPONENTS + ["parser"])
+                self.nlp.enable_pipe("senter")
+            else:
+                self.nlp = spacy.load(SPACY_MODELS[self.segmenter], exclude=NON_SENTENCE_COMPONENTS)
         return self.nlp
 
     def process_text(self, text):
         nlp = self.load_model()
         return nlp(text)
+
+    def process_texts(self, texts: list[str], batch_size: int = 32, n_process: int = 1) -> list:
+        nlp = self.load_model()
+        return list(nlp.pipe(texts, batch_size=batch_size, n_process=n_process))
@@ -142,12 +142,42 @@ class EpubItem(object):
         self.id = uid
         self.file_name = file_name
         self.media_type = media_type
+        self._loader = None
         self.content = content
         self.is_linear = True
         self.manifest = manifest
 
         self.book = None
 
+    @property
+    def content(self):
+        # Items read in lazy mode only fetch their content from the book file on first access.
+        if self._content is None and self._loader is not None:
+            self._content = self._loader()
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    def set_loader(self, loader):
+        """
+        Defines how the content of this item is loaded on first access. Used when reading books in lazy mode.
+
+        :Args:
+          - loader: Callable without arguments which returns the content
+        """
+        self._loader = loader
+        self._content = None
+
+    def release_content(self):
+        """
+        Drops the loaded content of a lazily read item. It is loaded again on the next access. Items without
+        a loader keep their content.
+        """
+        if self._loader is not None:
+            self._content = None
+
     def get_id(self):
         """
         Returns unique identifier for this item.
@@ -576,6 +606,11 @@ class EpubBook(object):
 
         self.metadata = {}
         self.items = []
+        # lookup tables for the items, maintained by add_item
+        self._items_by_id = {}
+        self._items_by_href = {}
+        self._items_by_type = {}
+        self._items_by_media_type = {}
         self.spine = []
         self.guide = []
         self.pages = []
@@ -609,6 +644,18 @@ class EpubBook(object):
         self.prefixes = []
         self.namespaces = {}
 
+        # file the content of lazily read items is loaded from
+        self._source = None
+
+    def close(self):
+        """
+        Closes the file the book was read from. Only needed for books read in lazy mode, where the content of the
+        items is loaded on first access. Content which was not loaded before closing can not be accessed anymore.
+        """
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
     def set_identifier(self, uid):
         """
         Sets unique id for this epub
@@ -755,9 +802,17 @@ class EpubBook(object):
 
         item.book = self
         self.items.append(item)
+        self._index_item(item)
 
         return item
 
+    def _index_item(self, item):
+        # the first item wins for duplicate ids and hrefs, the same one a scan over self.items would find
+        self._items_by_id.setdefault(item.get_id(), item)
+        self._items_by_href.setdefault(zip_path.normpath(item.get_name()), item)
+        self._items_by_type.setdefault(item.get_type(), []).append(item)
+        self._items_by_media_type.setdefault(item.media_type, []).append(item)
+
     def get_item_with_id(self, uid):
         """
         Returns item for defined UID.
@@ -770,11 +825,7 @@ class EpubBook(object):
         :Returns:
           Returns item object. Returns None if nothing was found.
         """
-        for item in self.get_items():
-            if item.id == uid:
-                return item
-
-        return None
+        return self._items_by_id.get(uid)
 
     def get_item_with_href(self, href):
         """
@@ -788,11 +839,7 @@ class EpubBook(object):
         :Returns:
           Returns item object. Returns None if nothing was found.
         """
-        for item in self.get_items():
-            if item.get_name() == href:
-                return item
-
-        return None
+        return self._items_by_href.get(zip_path.normpath(href))
 
     def get_items(self):
         """
@@ -815,7 +862,7 @@ class EpubBook(object):
         :Returns:
           Returns found items as tuple.
         """
-        return (item for item in self.items if item.get_type() == item_type)
+        return (item for item in self._items_by_type.get(item_type, []))
 
     def get_items_of_media_type(self, media_type):
         """
@@ -827,7 +874,7 @@ class EpubBook(object):
         :Returns:
           Returns found items as tuple.
         """
-        return (item for item in self.items if item.media_type == media_type)
+        return (item for item in self._items_by_media_type.get(media_type, []))
 
     def set_template(self, name, value):
         """
@@ -1388,12 +1435,15 @@ class EpubWriter(object):
 
 
 class EpubReader(object):
-    DEFAULT_OPTIONS = {"ignore_ncx": False}
+    DEFAULT_OPTIONS = {"ignore_ncx": False, "lazy": False}
 
     def __init__(self, epub_file_name, options=None):
         self.file_name = epub_file_name
         self.book = EpubBook()
         self.zf = None
+        # normalized file name -> name in the zip directory
+        self.names = {}
+        self._nav_item = None
 
         self.opf_file = ""
         self.opf_dir = ""
@@ -1427,8 +1477,20 @@ class EpubReader(object):
 
     def read_file(self, name):
         # Raises KeyError
-        name = zip_path.normpath(name)
-        return self.zf.read(name)
+        return self.zf.read(self.names[zip_path.normpath(name)])
+
+    def has_file(self, name):
+        # Only looks at the index of the zip directory, nothing is decompressed
+        return zip_path.normpath(name) in self.names
+
+    def _build_name_index(self):
+        self.names = {zip_path.normpath(name): name for name in self.zf.namelist()}
+
+    def _set_item_content(self, item, name, content):
+        if self.options.get("lazy"):
+            item.set_loader(lambda: self.read_file(name))
+        else:
+            item.content = content
 
     def _load_container(self):
         meta_inf = self.read_file("META-INF/container.xml")
@@ -1504,14 +1566,25 @@ class EpubReader(object):
                 self.book.uid = value
 
     def _load_manifest(self):
+        lazy = self.options.get("lazy")
+
         for r in self.container.find("{%s}%s" % (NAMESPACES["OPF"], "manifest")):
             if r is not None and r.tag != "{%s}item" % NAMESPACES["OPF"]:
                 continue
 
-            try:
-                self.read_file(zip_path.join(self.opf_dir, unquote(r.get("href"))))
-            except KeyError:
-                continue
+            file_name = unquote(r.get("href"))
+            path = zip_path.join(self.opf_dir, file_name)
+
+            # in lazy mode nothing is read here, otherwise every file is read once
+            content = None
+            if lazy:
+                if not self.has_file(path):
+                    continue
+            else:
+                try:
+                    content = self.read_file(path)
+                except KeyError:
+                    continue
 
             media_type = r.get("media-type")
             _properties = r.get("properties", "")
@@ -1526,57 +1599,48 @@ class EpubReader(object):
                 media_type = "image/jpeg"
 
             if media_type == "application/x-dtbncx+xml":
-                ei = EpubNcx(uid=r.get("id"), file_name=unquote(r.get("href")))
-
-                ei.content = self.read_file(zip_path.join(self.opf_dir, ei.file_name))
+                ei = EpubNcx(uid=r.get("id"), file_name=file_name)
             elif media_type == "application/smil+xml":
-                ei = EpubSMIL(uid=r.get("id"), file_name=unquote(r.get("href")))
-
-                ei.content = self.read_file(zip_path.join(self.opf_dir, ei.file_name))
+                ei = EpubSMIL(uid=r.get("id"), file_name=file_name)
             elif media_type == "application/xhtml+xml":
                 if "nav" in properties:
-                    ei = EpubNav(uid=r.get("id"), file_name=unquote(r.get("href")))
-
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, r.get("href")))
+                    ei = EpubNav(uid=r.get("id"), file_name=file_name)
                 elif "cover" in properties:
                     ei = EpubCoverHtml()
-
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, unquote(r.get("href"))))
                 else:
                     ei = EpubHtml()
 
                     ei.id = r.get("id")
-                    ei.file_name = unquote(r.get("href"))
+                    ei.file_name = file_name
                     ei.media_type = media_type
                     ei.media_overlay = r.get("media-overlay", None)
                     ei.media_duration = r.get("duration", None)
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
                     ei.properties = properties
             elif media_type in IMAGE_MEDIA_TYPES:
                 if "cover-image" in properties:
-                    ei = EpubCover(uid=r.get("id"), file_name=unquote(r.get("href")))
+                    ei = EpubCover(uid=r.get("id"), file_name=file_name)
 
                     ei.media_type = media_type
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
                 else:
                     ei = EpubImage()
 
                     ei.id = r.get("id")
-                    ei.file_name = unquote(r.get("href"))
+                    ei.file_name = file_name
                     ei.media_type = media_type
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
             else:
                 # different types
                 ei = EpubItem()
 
                 ei.id = r.get("id")
-                ei.file_name = unquote(r.get("href"))
+                ei.file_name = file_name
                 ei.media_type = media_type
 
-                ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
-
+            self._set_item_content(ei, path, content)
             self.book.add_item(ei)
 
+            if self._nav_item is None and isinstance(ei, EpubNav):
+                self._nav_item = ei
+
     def _parse_ncx(self, data):
         tree = parse_string(data)
         tree_root = tree.getroot()
@@ -1650,17 +1714,14 @@ class EpubReader(object):
             # generate the per-file pages lists
             # because of the order of parsing the files, this can't be done
             # when building the EpubHtml objects
-            htmlfiles = dict()
-            for htmlfile in self.book.items:
-                if isinstance(htmlfile, EpubHtml):
-                    htmlfiles[htmlfile.file_name] = htmlfile
             for page in self.book.pages:
                 try:
                     (filename, idref) = page.href.split("#")
                 except ValueError:
                     filename = page.href
-                if filename in htmlfiles:
-                    htmlfiles[filename].pages.append(page)
+                htmlfile = self.book.get_item_with_href(filename)
+                if isinstance(htmlfile, EpubHtml):
+                    htmlfile.pages.append(page)
 
     def _load_spine(self):
         spine = self.container.find("{%s}%s" % (NAMESPACES["OPF"], "spine"))
@@ -1671,13 +1732,12 @@ class EpubReader(object):
         self.book.set_direction(spine.get("page-progression-direction", None))
 
         # should read ncx or nav file
-        nav_item = next((item for item in self.book.items if isinstance(item, EpubNav)), None)
         if toc:
-            if not self.options.get("ignore_ncx") or not nav_item:
-                try:
-                    ncxFile = self.read_file(zip_path.join(self.opf_dir, self.book.get_item_with_id(toc).get_name()))
-                except KeyError:
+            if not self.options.get("ignore_ncx") or not self._nav_item:
+                ncx_item = self.book.get_item_with_id(toc)
+                if ncx_item is None:
                     raise EpubException(-1, "Can not find ncx file.")
+                ncxFile = ncx_item.get_content()
 
                 self._parse_ncx(ncxFile)
 
@@ -1701,7 +1761,7 @@ class EpubReader(object):
 
         # read nav file if found
         #
-        nav_item = next((item for item in self.book.items if isinstance(item, EpubNav)), None)
+        nav_item = self._nav_item
         if nav_item:
             if self.options.get("ignore_ncx") or not self.book.toc:
                 self._parse_nav(nav_item.content, zip_path.dirname(nav_item.file_name), navtype="toc")
@@ -1716,6 +1776,13 @@ class EpubReader(object):
                     with open(os.path.join(file_name, subname), "rb") as fp:
                         return fp.read()
 
+                def namelist(self):
+                    return [
+                        zip_path.join(*os.path.relpath(os.path.join(root, name), file_name).split(os.sep))
+                        for root, _, names in os.walk(file_name)
+                        for name in names
+                    ]
+
                 def close(self):
                     pass
 
@@ -1728,11 +1795,18 @@ class EpubReader(object):
             except zipfile.LargeZipFile as bz:
                 raise EpubException(1, "Large Zip file")
 
+        # every membership check goes through this index instead of reading the file
+        self._build_name_index()
+
         # 1st check metadata
         self._load_container()
         self._load_opf_file()
 
-        self.zf.close()
+        # lazy items still need the file, it is closed with EpubBook.close()
+        if self.options.get("lazy"):
+            self.book._source = self.zf
+        else:
+            self.zf.close()
 
 
 # WRITE
@@ -1768,6 +1842,12 @@ def read_epub(name, options=None):
 
     >>> book = ebooklib.read_epub('book.epub')
 
+    With the lazy option the content of an item is only read from the file when it is accessed, and the book has
+    to be closed when it is not needed anymore.
+
+    >>> book = ebooklib.read_epub('book.epub', {'lazy': True})
+    >>> book.close()
+
     :Args:
       - name: full path to the input file
       - options: extra options as dictionary (optional)
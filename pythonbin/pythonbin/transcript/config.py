@@ -7,3 +7,4 @@ class Config:
     polling_interval: int = 1  # Polling interval in seconds for fallback
     notification_interval: int = 60  # Notification interval in seconds
     activity_trigger_threshold: int = 5  # Threshold of new entries to trigger notification
+    debounce_interval: float = 0.5  # Quiet period in seconds that ends a burst of writes before notifying
@@ -1,4 +1,5 @@
 import pathlib
+import threading
 import time
 import os
 
@@ -7,14 +8,16 @@ from watchdog.events import FileSystemEventHandler, FileSystemEvent
 
 from pythonbin.transcript.observer.llm_observer import LLMObserver
 from pythonbin.transcript.observer.observer import Observer
-from pythonbin.transcript.parser import TranscriptParser
-from pythonbin.transcript.model import Transcript
+from pythonbin.transcript.parser import TranscriptTailReader
+from pythonbin.transcript.model import Transcript, TranscriptEntry, TranscriptStore
 from pythonbin.transcript.config import Config
+from pythonbin.transcript.scheduler import NotificationScheduler
 
 
 class PrintObserver(Observer):
-    def update(self, payload: Transcript):
-        print(payload)
+    def update(self, payload: Transcript, new_entries: list[TranscriptEntry]):
+        for entry in new_entries:
+            print(entry)
 
 
 class TranscriptFileWatcher:
@@ -23,7 +26,7 @@ class TranscriptFileWatcher:
         filepath: str,
         config: Config,
         observer: Observer,
-        transcript_parser: TranscriptParser | None = None,
+        transcript_reader: TranscriptTailReader | None = None,
     ):
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File {filepath} does not exist.")
@@ -35,11 +38,16 @@ class TranscriptFileWatcher:
         self.last_modified = os.path.getmtime(filepath)
         self.running = True
         self.observer = observer
+        # Watchdog events and the initial read may race, the reader is only used by one of them at a time.
+        self.lock = threading.Lock()
 
-        if transcript_parser is None:
-            self.transcript_parser = TranscriptParser(filepath)
+        if transcript_reader is None:
+            self.transcript_reader = TranscriptTailReader(filepath)
         else:
-            self.transcript_parser = transcript_parser
+            self.transcript_reader = transcript_reader
+
+        self.scheduler = NotificationScheduler(observer, config, self.snapshot)
+        self.scheduler.start()
 
         self.setup_watchdog()
 
@@ -54,16 +62,25 @@ class TranscriptFileWatcher:
         self.handle_file_change()
 
     def handle_file_change(self):
-        """Handle the file change event."""
-        print(f"File {self.filepath} has changed.")
-        transcript = Transcript(entries=list(self.transcript_parser.parse()))
-        self.observer.update(transcript)
+        """Handle the file change event. New entries are handed to the scheduler, which notifies the observer."""
+        with self.lock:
+            count = self.transcript_reader.read()
+            if not count:
+                return
+            print(f"File {self.filepath} has {count} new entries.")
+            self.scheduler.add(count)
+
+    def snapshot(self) -> tuple[TranscriptStore, int]:
+        with self.lock:
+            store = self.transcript_reader.store
+            return store, len(store)
 
     def stop(self):
         """Stop the watcher."""
         if self.watchdog_observer:
             self.watchdog_observer.stop()
             self.watchdog_observer.join()
+        self.scheduler.stop()
         self.running = False
 
 
@@ -99,7 +116,7 @@ def run_main():
     transcript_file = "/Users/asimi/Downloads/20240418 1602 Transcription.txt"
 
     prompt_path = pathlib.Path("~/Obsidian/Level/Chats/Prompt.md").expanduser()
-    observer = LLMObserver(prompt_path)
+    observer = LLMObserver(prompt_path, session=True)
 
     config = Config()
     watcher = TranscriptFileWatcher(transcript_file, config, observer)
@@ -1,4 +1,5 @@
 import datetime
+from array import array
 
 from pydantic import BaseModel, computed_field
 
@@ -20,3 +21,53 @@ class TranscriptEntry(BaseModel):
     time: datetime.timedelta
     speaker: str
     text: str
+
+
+class TranscriptStore:
+    """Compact, append-only storage for the entries of a long transcript.
+
+    A pydantic entry per line costs several objects and a validation each. The store instead keeps columns: the time
+    of each entry in microseconds, the speaker as an index into the few distinct speaker names, and the text of all
+    entries in one UTF-8 buffer with the end offset of each entry. Entries are exported as pydantic models only when an
+    observer needs them, without validating them again.
+    """
+
+    __slots__ = ("speaker_ids", "speaker_index", "speakers", "text", "text_ends", "times")
+
+    def __init__(self):
+        self.times = array("q")
+        self.speaker_ids = array("H")
+        self.speakers: list[str] = []
+        self.speaker_index: dict[str, int] = {}
+        self.text = bytearray()
+        self.text_ends = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, microseconds: int, speaker: str, text: str) -> None:
+        speaker_id = self.speaker_index.get(speaker)
+        if speaker_id is None:
+            speaker_id = self.speaker_index[speaker] = len(self.speakers)
+            self.speakers.append(speaker)
+        self.times.append(microseconds)
+        self.speaker_ids.append(speaker_id)
+        self.text += text.encode()
+        self.text_ends.append(len(self.text))
+
+    def entry(self, i: int) -> TranscriptEntry:
+        start = self.text_ends[i - 1] if i > 0 else 0
+        return TranscriptEntry.model_construct(
+            time=datetime.timedelta(microseconds=self.times[i]),
+            speaker=self.speakers[self.speaker_ids[i]],
+            text=self.text[start : self.text_ends[i]].decode(),
+        )
+
+    def entries(self, start: int = 0, stop: int | None = None) -> list[TranscriptEntry]:
+        """Export the entries from `start` up to `stop`, or the end."""
+        stop = len(self) if stop is None else stop
+        return [self.entry(i) for i in range(start, stop)]
+
+    def to_transcript(self, stop: int | None = None) -> Transcript:
+        """Export the entries up to `stop`, or the end, as a transcript."""
+        return Transcript.model_construct(entries=self.entries(0, stop))
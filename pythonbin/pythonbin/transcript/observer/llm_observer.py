@@ -9,7 +9,7 @@ from openai import AssistantEventHandler
 from openai.types.beta.threads.runs import RunStep, ToolCall
 from typing_extensions import override
 
-from pythonbin.transcript.model import Transcript
+from pythonbin.transcript.model import Transcript, TranscriptEntry
 from pythonbin.transcript.observer.llm_tools import GiveTranscriptAnalysis
 from pythonbin.transcript.observer.observer import Observer
 
@@ -25,11 +25,19 @@ def wait_on_run(client, run, thread):
 
 
 class LLMObserver(Observer):
+    """Asks an OpenAI assistant to analyze the transcript on each update.
+
+    With `session`, one thread is kept for the meeting and each update only appends the new transcript lines, so
+    content already sent is reused from the thread instead of uploaded again. Otherwise every update starts a new thread
+    with the whole transcript.
+    """
+
     def __init__(
         self,
         prompt: str | pathlib.Path,
         model_name: str = "gpt-4-turbo",
         max_tokens: int = 4096,
+        session: bool = False,
     ):
         self.model_name = model_name
         self.prompt = """You are a helpful senior software engineer.
@@ -41,6 +49,11 @@ _**Key Evaluation Areas:** Requirements gathering, API design, scalability, data
 """
         # self.prompt = self._load_prompt(prompt)
         self.max_tokens = max_tokens
+        self.chunker = TokenChunker()
+        self.session = session
+        self.thread = None
+        # Number of transcript entries whose lines are already messages in the session thread
+        self.sent_entries = 0
 
         self.client = openai.Client()
         self.instructions = f"{self.prompt}"
@@ -75,21 +88,14 @@ _**Key Evaluation Areas:** Requirements gathering, API design, scalability, data
                 return file.read()
         return prompt
 
-    def update(self, payload: Transcript):
-        thread = self.client.beta.threads.create()
-
-        transcript_chunks = self._transcript_to_texts(payload)
-        for chunk in transcript_chunks:
-            self.client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=chunk,
-            )
-        self.client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=self._generate_instructions(),
-        )
+    def update(self, payload: Transcript, new_entries: list[TranscriptEntry]):
+        if self.session:
+            thread = self._append_to_session(payload, new_entries)
+        else:
+            thread = self.client.beta.threads.create()
+            for chunk in self._transcript_to_texts(payload, new_entries):
+                self._add_message(thread, chunk)
+            self._add_message(thread, self._generate_instructions())
 
         with self.client.beta.threads.runs.stream(
             thread_id=thread.id,
@@ -99,10 +105,55 @@ _**Key Evaluation Areas:** Requirements gathering, API design, scalability, data
         ) as stream:
             stream.until_done()
 
-    def _transcript_to_texts(self, transcript: Transcript) -> list[str]:
-        lines = [f"[{entry.time}] {entry.speaker}: {entry.text}" for entry in transcript.entries]
-        lines.append(f"Time elapsed: {transcript.elapsed_time_in_minutes}")
-        chunks = chunk_text_by_tokens(lines)
+    def _add_message(self, thread, content: str):
+        self.client.beta.threads.messages.create(
+            thread_id=thread.id,
+            role="user",
+            content=content,
+        )
+
+    def _append_to_session(self, transcript: Transcript, new_entries: list[TranscriptEntry]):
+        # A transcript that was restarted, or entries that were missed, start a new thread.
+        if self.thread is None or self.sent_entries + len(new_entries) != len(transcript.entries):
+            self.thread = self.client.beta.threads.create()
+            self.sent_entries = 0
+
+        entries = transcript.entries[self.sent_entries :]
+        try:
+            for chunk in self._session_texts(transcript, entries):
+                self._add_message(self.thread, chunk)
+            self._add_message(self.thread, self._generate_instructions())
+        except Exception:
+            # The thread may hold part of the update, start over rather than send lines twice.
+            self.thread = None
+            raise
+        self.sent_entries = len(transcript.entries)
+        return self.thread
+
+    def _session_texts(self, transcript: Transcript, entries: list[TranscriptEntry]) -> list[str]:
+        lines = [f"[{entry.time}] {entry.speaker}: {entry.text}" for entry in entries]
+        chunks = chunk_text_by_tokens(lines, k=self.chunker.k, encoding=self.chunker.encoding)
+        intro = (
+            "Here is part of the meeting transcript:"
+            if self.sent_entries == 0
+            else "Here is the next part of the meeting transcript, continuing the parts above:"
+        )
+        chunks = [f"{intro}\n\n{chunk}" for chunk in chunks]
+        chunks.append(
+            f"""Time elapsed: {transcript.elapsed_time_in_minutes}
+End of meeting transcript so far, but note that the meeting may not be finished.
+
+Remember to first discuss next steps, be clear and concrete and specific and decisive."""
+        )
+        return chunks
+
+    def _transcript_to_texts(self, transcript: Transcript, new_entries: list[TranscriptEntry]) -> list[str]:
+        # Only the new entries are encoded, unless the transcript was restarted or entries were missed.
+        if len(self.chunker) + len(new_entries) != len(transcript.entries):
+            self.chunker.reset()
+            new_entries = transcript.entries
+        self.chunker.extend([f"[{entry.time}] {entry.speaker}: {entry.text}" for entry in new_entries])
+        chunks = self.chunker.chunks(tail=f"Time elapsed: {transcript.elapsed_time_in_minutes}")
         for i, chunk in enumerate(chunks):
             chunks[i] = f"Here is part of the meeting transcript:\n\n{chunk}"
 
@@ -154,38 +205,54 @@ MUST NOT create a message to give your analysis.
 # """
 
 
-def chunk_text_by_tokens(lines: list[str], k=2048) -> list[str]:
-    # Join lines with two line feeds
-    text = "\n\n".join(lines)
+def chunk_text_by_tokens(lines: list[str], k=2048, encoding: tiktoken.Encoding | None = None) -> list[str]:
+    # Join lines with two line feeds and split the tokens into chunks of at most k tokens
+    if not lines:
+        return []
+    chunker = TokenChunker(k, encoding)
+    chunker.extend(lines[:-1])
+    return chunker.chunks(tail=lines[-1])
+
+
+class TokenChunker:
+    """Splits transcript lines, joined by two line feeds, into chunks of at most `k` tokens, caching work between calls.
+
+    The tokens of the lines seen so far are kept in one list, so only lines added by `extend` are encoded. Chunks are
+    slices of that list, and chunks made only of lines seen before are decoded once. The cost of an update is
+    proportional to the new lines, not the whole meeting.
+    """
 
-    encoding = tiktoken.get_encoding("cl100k_base")
+    separator = "\n\n"
 
-    # Tokenize the text
-    tokens = encoding.encode(text)
+    def __init__(self, k: int = 2048, encoding: tiktoken.Encoding | None = None):
+        self.k = k
+        self.encoding = encoding if encoding is not None else tiktoken.get_encoding("cl100k_base")
+        self.reset()
 
-    # Initialize variables for chunking
-    chunks = []
-    current_chunk = []
-    current_length = 0
+    def reset(self) -> None:
+        self.line_count = 0
+        # Tokens of every line followed by the separator
+        self.tokens: list[int] = []
+        # Decoded chunks of k tokens lying entirely within self.tokens, these never change
+        self.full_chunks: list[str] = []
 
-    for token in tokens:
-        # Add the token to the current chunk
-        current_chunk.append(token)
-        current_length += 1
+    def __len__(self) -> int:
+        return self.line_count
 
-        # If the current chunk length is equal to or exceeds k, finalize the current chunk
-        if current_length >= k:
-            chunk_text = encoding.decode(current_chunk)
-            chunks.append(chunk_text)
-            current_chunk = []
-            current_length = 0
+    def extend(self, lines: list[str]) -> None:
+        for line in lines:
+            self.tokens.extend(self.encoding.encode(line + self.separator))
+        self.line_count += len(lines)
 
-    # Add the last chunk if it's not empty
-    if current_chunk:
-        chunk_text = encoding.decode(current_chunk)
-        chunks.append(chunk_text)
+    def chunks(self, tail: str = "") -> list[str]:
+        """Chunk the lines seen so far followed by `tail`, which is encoded on every call and not kept."""
+        k = self.k
+        n_full = len(self.tokens) // k
+        for i in range(len(self.full_chunks), n_full):
+            self.full_chunks.append(self.encoding.decode(self.tokens[i * k : (i + 1) * k]))
 
-    return chunks
+        rest = self.tokens[n_full * k :] + self.encoding.encode(tail)
+        return self.full_chunks + [self.encoding.decode(rest[i : i + k]) for i in range(0, len(rest), k)]
 
 
 class EventHandler(AssistantEventHandler):
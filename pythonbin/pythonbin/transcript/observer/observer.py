@@ -1,8 +1,9 @@
 from typing import Protocol
 
-from pythonbin.transcript.model import Transcript
+from pythonbin.transcript.model import Transcript, TranscriptEntry
 
 
 class Observer(Protocol):
-    def update(self, payload: Transcript):
+    def update(self, payload: Transcript, new_entries: list[TranscriptEntry]):
+        """Receive the whole transcript so far and the entries appended since the last update."""
         ...
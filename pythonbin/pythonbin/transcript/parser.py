@@ -1,8 +1,9 @@
 import re
 import datetime
+import os
 from typing import Generator
 
-from pythonbin.transcript.model import TranscriptEntry
+from pythonbin.transcript.model import Transcript, TranscriptEntry, TranscriptStore
 
 timestamp_pattern = r"^\[(\d{2}:\d{2}:\d{2}\.\d{2})]"
 speaker_pattern = r"(.*?):"
@@ -10,6 +11,22 @@ text_pattern = r"(.*)$"
 pattern = re.compile(rf"{timestamp_pattern}\s+?{speaker_pattern}\s+{text_pattern}")
 
 
+def parse_line_fields(line: str) -> tuple[int, str, str] | None:
+    """Parse a single line of the transcript into its time in microseconds, speaker and text.
+
+    >>> parse_line_fields("[00:01:02.50] Other(s): Hi!")
+    (62050000, 'Other(s)', 'Hi!')
+    """
+
+    match = pattern.match(line)
+    if not match:
+        return None
+
+    timestamp, speaker, text = match.groups()
+    seconds = int(timestamp[:2]) * 3600 + int(timestamp[3:5]) * 60 + int(timestamp[6:8])
+    return seconds * 1_000_000 + int(timestamp[9:]) * 1000, speaker, text
+
+
 def parse_line(line: str) -> TranscriptEntry | None:
     """Parse a single line of the transcript.
 
@@ -23,18 +40,12 @@ def parse_line(line: str) -> TranscriptEntry | None:
     TranscriptEntry(time=datetime.timedelta(microseconds=22000), speaker='Me', text='Hey there!')
     """
 
-    match = pattern.match(line)
-    if not match:
+    fields = parse_line_fields(line)
+    if not fields:
         return None
 
-    timestamp, speaker, text = match.groups()
-    time = datetime.timedelta(
-        hours=int(timestamp[:2]),
-        minutes=int(timestamp[3:5]),
-        seconds=float(timestamp[6:8]),
-        microseconds=int(timestamp[9:]) * 1000,
-    )
-    return TranscriptEntry(time=time, speaker=speaker, text=text)
+    microseconds, speaker, text = fields
+    return TranscriptEntry(time=datetime.timedelta(microseconds=microseconds), speaker=speaker, text=text)
 
 
 class TranscriptParser:
@@ -48,3 +59,63 @@ class TranscriptParser:
                 entry = parse_line(line)
                 if entry:
                     yield entry
+
+
+class TranscriptTailReader:
+    """Reads a transcript file that is being appended to, parsing only the bytes added since the last read.
+
+    The reader keeps the byte offset it has read up to and buffers a trailing partial line until its newline arrives,
+    so a line is parsed once, when it is complete. `store` holds every entry read so far. If the file shrinks or is
+    replaced by a new file, it is read again from the start into a new `store`, so a store handed out earlier is only
+    ever appended to.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.offset = 0
+        self.buffer = b""
+        self.inode: int | None = None
+        self.store = TranscriptStore()
+
+    def reset(self) -> None:
+        self.offset = 0
+        self.buffer = b""
+        self.store = TranscriptStore()
+
+    @property
+    def transcript(self) -> Transcript:
+        return self.store.to_transcript()
+
+    def read(self) -> int:
+        """Parse the lines completed since the last call into `store`, returning how many entries were added."""
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            # The file is being rotated, read the new one on the next change.
+            return 0
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            if self.inode is not None:
+                print(f"File {self.filepath} was truncated or replaced, reading it from the start.")
+            self.inode = stat.st_ino
+            self.reset()
+        if stat.st_size == self.offset:
+            return 0
+
+        with open(self.filepath, "rb") as file:
+            file.seek(self.offset)
+            data = file.read()
+        self.offset += len(data)
+
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        count = len(self.store)
+        for line in lines:
+            fields = parse_line_fields(line.decode("utf-8", errors="replace").rstrip("\r"))
+            if fields:
+                self.store.append(*fields)
+        return len(self.store) - count
+
+    def read_new_entries(self) -> list[TranscriptEntry]:
+        """Like `read`, returning the new entries."""
+        count = self.read()
+        return self.store.entries(len(self.store) - count)
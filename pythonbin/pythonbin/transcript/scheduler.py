@@ -0,0 +1,114 @@
+import threading
+import time
+import traceback
+from collections.abc import Callable
+
+from pythonbin.transcript.config import Config
+from pythonbin.transcript.model import TranscriptStore
+from pythonbin.transcript.observer.observer import Observer
+
+
+class NotificationScheduler:
+    """Coalesces transcript changes and notifies the observer from a worker thread.
+
+    Changes only record how many entries arrived, so the watchdog thread never waits on the observer. The observer is
+    notified once writes have paused for `debounce_interval` seconds, and either `activity_trigger_threshold` entries
+    are pending or `notification_interval` seconds have passed since the last notification. The first notification
+    only waits for the pause, and a burst that never pauses is cut off `notification_interval` seconds after its first
+    entry.
+
+    `snapshot` returns the transcript store and how many entries it holds. The store is only appended to, so the
+    entries up to that count stay consistent while changes keep arriving. The pydantic payload is exported from the
+    store for each notification and not kept afterwards, so only the store holds the meeting between notifications.
+    """
+
+    def __init__(
+        self,
+        observer: Observer,
+        config: Config,
+        snapshot: Callable[[], tuple[TranscriptStore, int]],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.observer = observer
+        self.config = config
+        self.snapshot = snapshot
+        self.clock = clock
+
+        self.condition = threading.Condition()
+        self.pending = 0
+        self.first_change: float | None = None
+        self.last_change: float | None = None
+        self.last_notification: float | None = None
+        self.store: TranscriptStore | None = None
+        self.sent = 0
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Stop the worker after notifying the observer of any pending entries."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+
+    def add(self, count: int):
+        """Record that `count` new entries were appended."""
+        with self.condition:
+            now = self.clock()
+            if self.pending == 0:
+                self.first_change = now
+            self.pending += count
+            self.last_change = now
+            self.condition.notify()
+
+    def due_at(self) -> float | None:
+        """When the pending entries should be sent, None if there are none."""
+        if self.pending == 0:
+            return None
+        quiet = min(
+            self.last_change + self.config.debounce_interval,  # type: ignore
+            self.first_change + self.config.notification_interval,  # type: ignore
+        )
+        if self.last_notification is None or self.pending >= self.config.activity_trigger_threshold:
+            return quiet
+        return max(quiet, self.last_notification + self.config.notification_interval)
+
+    def wait_until_due(self) -> bool:
+        """Block until pending entries are due, returning False once stopped with nothing pending."""
+        with self.condition:
+            while True:
+                due = self.due_at()
+                if self.stopping:
+                    return due is not None
+                now = self.clock()
+                if due is not None and now >= due:
+                    return True
+                self.condition.wait(None if due is None else due - now)
+
+    def run(self):
+        while self.wait_until_due():
+            with self.condition:
+                self.pending = 0
+                self.first_change = None
+                self.last_notification = self.clock()
+            self.notify()
+
+    def notify(self):
+        store, count = self.snapshot()
+        # A transcript that was truncated or replaced starts over.
+        if store is not self.store or count < self.sent:
+            self.store = store
+            self.sent = 0
+        if count == self.sent:
+            return
+        transcript = store.to_transcript(count)
+        new_entries = transcript.entries[self.sent :]
+        self.sent = count
+        try:
+            self.observer.update(transcript, new_entries)
+        except Exception:  # noqa: BLE001
+            # A failed notification must not stop later ones.
+            traceback.print_exc()
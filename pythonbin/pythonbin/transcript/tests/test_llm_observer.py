@@ -0,0 +1,112 @@
+import contextlib
+import datetime
+from types import SimpleNamespace
+
+import tiktoken
+
+from pythonbin.transcript.model import Transcript, TranscriptEntry
+from pythonbin.transcript.observer import llm_observer
+from pythonbin.transcript.observer.llm_observer import LLMObserver, TokenChunker
+
+
+def byte_encoding() -> tiktoken.Encoding:
+    # One token per byte, built locally so the test does not download an encoding.
+    return tiktoken.Encoding(
+        name="bytes", pat_str=r"[\s\S]", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={}
+    )
+
+
+def reference_chunks(lines: list[str], k: int) -> list[str]:
+    text = "\n\n".join(lines).encode()
+    return [text[i : i + k].decode() for i in range(0, len(text), k)]
+
+
+def test_token_chunker_matches_full_chunking():
+    lines = [f"[0:00:{i:02d}] Me: line number {i}" for i in range(40)]
+    chunker = TokenChunker(k=64, encoding=byte_encoding())
+    chunker.extend(lines)
+
+    assert chunker.chunks(tail="Time elapsed: 0.0 minutes") == reference_chunks(
+        lines + ["Time elapsed: 0.0 minutes"], 64
+    )
+    assert len(chunker) == 40
+
+
+def test_token_chunker_encodes_only_new_lines():
+    encoding = byte_encoding()
+    encoded: list[str] = []
+    encode = encoding.encode
+
+    def counting_encode(text, *args, **kwargs):
+        encoded.append(text)
+        return encode(text, *args, **kwargs)
+
+    encoding.encode = counting_encode  # type: ignore
+    lines = [f"[0:00:{i:02d}] Other(s): reply {i}" for i in range(30)]
+    chunker = TokenChunker(k=50, encoding=encoding)
+
+    for i in range(0, 30, 10):
+        chunker.extend(lines[i : i + 10])
+        chunks = chunker.chunks(tail=f"Time elapsed: {i}")
+        assert chunks == reference_chunks(lines[: i + 10] + [f"Time elapsed: {i}"], 50)
+
+    # Every line is encoded once, plus the tail on each call.
+    assert len(encoded) == 30 + 3
+    full_chunks = list(chunker.full_chunks)
+    chunker.chunks()
+    assert chunker.full_chunks == full_chunks
+
+    chunker.reset()
+    assert len(chunker) == 0
+    assert chunker.chunks() == []
+
+
+class FakeClient:
+    """Records the threads and messages the observer creates, without calling the API."""
+
+    def __init__(self):
+        self.threads: dict[str, list[str]] = {}
+        self.runs: list[str] = []
+        self.beta = SimpleNamespace(
+            assistants=SimpleNamespace(create=lambda **kwargs: SimpleNamespace(id="assistant")),
+            threads=SimpleNamespace(
+                create=self.create_thread,
+                messages=SimpleNamespace(create=self.create_message),
+                runs=SimpleNamespace(stream=self.stream),
+            ),
+        )
+
+    def create_thread(self):
+        thread = SimpleNamespace(id=f"thread-{len(self.threads)}")
+        self.threads[thread.id] = []
+        return thread
+
+    def create_message(self, thread_id, role, content):
+        self.threads[thread_id].append(content)
+
+    @contextlib.contextmanager
+    def stream(self, thread_id, **kwargs):
+        self.runs.append(thread_id)
+        yield SimpleNamespace(until_done=lambda: None)
+
+
+def test_llm_observer_session_appends_new_entries(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(llm_observer.openai, "Client", lambda: client)
+    monkeypatch.setattr(llm_observer.tiktoken, "get_encoding", lambda name: byte_encoding())
+    observer = LLMObserver("prompt", session=True)
+    entries = [TranscriptEntry(time=datetime.timedelta(seconds=i), speaker="Me", text=f"line {i}") for i in range(5)]
+
+    observer.update(Transcript(entries=entries[:3]), entries[:3])
+    observer.update(Transcript(entries=entries), entries[3:])
+
+    assert list(client.threads) == ["thread-0"]
+    assert client.runs == ["thread-0", "thread-0"]
+    transcript_messages = [m for m in client.threads["thread-0"] if "line " in m]
+    assert ["line 0" in m for m in transcript_messages] == [True, False]
+    assert "line 2" not in transcript_messages[1] and "line 4" in transcript_messages[1]
+
+    # A restarted transcript starts a new thread.
+    observer.update(Transcript(entries=entries[:1]), entries[:1])
+    assert client.runs[-1] == "thread-1"
+    assert sum("line 0" in m for m in client.threads["thread-1"]) == 1
@@ -0,0 +1,23 @@
+import datetime
+
+from pythonbin.transcript.model import TranscriptEntry, TranscriptStore
+
+
+def test_transcript_store():
+    store = TranscriptStore()
+    store.append(220_000, "Me", "Hey there!")
+    store.append(1_640_000, "Other(s)", "Hi, ça va?")
+    store.append(125_000_000, "Me", "")
+
+    assert len(store) == 3
+    assert store.speakers == ["Me", "Other(s)"]
+    assert list(store.speaker_ids) == [0, 1, 0]
+    assert store.entries(1) == [
+        TranscriptEntry(time=datetime.timedelta(microseconds=1_640_000), speaker="Other(s)", text="Hi, ça va?"),
+        TranscriptEntry(time=datetime.timedelta(seconds=125), speaker="Me", text=""),
+    ]
+    assert store.entries(0, 1)[0].text == "Hey there!"
+
+    transcript = store.to_transcript()
+    assert len(transcript.entries) == 3
+    assert transcript.elapsed_time_in_minutes == "2.0 minutes"
@@ -3,7 +3,7 @@ from typing import Generator
 
 import pytest
 
-from pythonbin.transcript.parser import TranscriptParser
+from pythonbin.transcript.parser import TranscriptParser, TranscriptTailReader
 
 
 @pytest.fixture
@@ -68,3 +68,39 @@ def test_invalid_format(invalid_format_file):
     parser = TranscriptParser(invalid_format_file.as_posix())
     entries = list(parser.parse())
     assert len(entries) == 1
+
+
+def test_tail_reader_parses_only_appended_lines(empty_file):
+    reader = TranscriptTailReader(empty_file.as_posix())
+    assert reader.read_new_entries() == []
+
+    with open(empty_file, "a") as file:
+        file.write("[00:00:00.22] Me:\tOkay, so let's do this.\n[00:00:01.64] Other(s): Yeah, let")
+    entries = reader.read_new_entries()
+    assert [entry.speaker for entry in entries] == ["Me"]
+
+    # The partial line is completed by the next write.
+    with open(empty_file, "a") as file:
+        file.write("'s do it.\r\n\n[00:00:02.00] Me: Next.\n")
+    entries = reader.read_new_entries()
+    assert [entry.text for entry in entries] == ["Yeah, let's do it.", "Next."]
+    assert len(reader.transcript.entries) == 3
+    assert reader.read_new_entries() == []
+
+
+def test_tail_reader_truncation_and_rotation(test_file):
+    reader = TranscriptTailReader(test_file.as_posix())
+    with open(test_file, "a") as file:
+        file.write("\n")
+    assert len(reader.read_new_entries()) == 2
+
+    with open(test_file, "w") as file:
+        file.write("[00:00:05.00] Me: Truncated.\n")
+    assert [entry.text for entry in reader.read_new_entries()] == ["Truncated."]
+    assert len(reader.transcript.entries) == 1
+
+    rotated = test_file.with_name("rotated.txt")
+    rotated.write_text("[00:00:00.00] Other(s): New file.\n[00:00:01.00] Me: Longer than the old one.\n")
+    rotated.replace(test_file)
+    assert [entry.text for entry in reader.read_new_entries()] == ["New file.", "Longer than the old one."]
+    assert len(reader.transcript.entries) == 2
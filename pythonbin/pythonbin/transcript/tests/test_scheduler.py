@@ -0,0 +1,123 @@
+import datetime
+import gc
+import threading
+import weakref
+
+from pythonbin.transcript.config import Config
+from pythonbin.transcript.model import Transcript, TranscriptEntry, TranscriptStore
+from pythonbin.transcript.scheduler import NotificationScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RecordingObserver:
+    def __init__(self):
+        self.updates: list[tuple[Transcript, list[TranscriptEntry]]] = []
+        self.event = threading.Event()
+
+    def update(self, payload: Transcript, new_entries: list[TranscriptEntry]):
+        self.updates.append((payload, new_entries))
+        self.event.set()
+
+
+def make_entries(n: int) -> list[TranscriptEntry]:
+    return [TranscriptEntry(time=datetime.timedelta(seconds=i), speaker="Me", text=f"line {i}") for i in range(n)]
+
+
+def test_due_at():
+    clock = FakeClock()
+    config = Config(notification_interval=60, activity_trigger_threshold=5, debounce_interval=0.5)
+    store = TranscriptStore()
+    scheduler = NotificationScheduler(RecordingObserver(), config, lambda: (store, 0), clock=clock)
+    assert scheduler.due_at() is None
+
+    # The first notification only waits for the burst to pause.
+    scheduler.add(1)
+    assert scheduler.due_at() == 0.5
+    clock.now = 0.3
+    scheduler.add(1)
+    assert scheduler.due_at() == 0.8
+
+    # Afterwards a few entries wait for the notification interval, enough entries only for the pause.
+    scheduler.pending = 0
+    scheduler.last_notification = 1.0
+    clock.now = 2.0
+    scheduler.add(2)
+    assert scheduler.due_at() == 61.0
+    scheduler.add(3)
+    assert scheduler.due_at() == 2.5
+
+    # A burst that never pauses is still sent one interval after it started.
+    for now in range(3, 100):
+        clock.now = float(now)
+        scheduler.add(1)
+    assert scheduler.due_at() == 62.0
+
+
+def test_scheduler_coalesces_changes():
+    entries = make_entries(6)
+    store = TranscriptStore()
+
+    def append(new_entries: list[TranscriptEntry]):
+        for entry in new_entries:
+            store.append(int(entry.time.total_seconds() * 1_000_000), entry.speaker, entry.text)
+
+    observer = RecordingObserver()
+    config = Config(notification_interval=60, activity_trigger_threshold=3, debounce_interval=0.05)
+    scheduler = NotificationScheduler(observer, config, lambda: (store, len(store)))
+    scheduler.start()
+
+    append(entries[:1])
+    scheduler.add(1)
+    assert observer.event.wait(timeout=5)
+    observer.event.clear()
+
+    # Below the threshold within the interval nothing is sent, until enough entries arrive.
+    append(entries[1:3])
+    scheduler.add(1)
+    scheduler.add(1)
+    assert not observer.event.wait(timeout=0.3)
+    append(entries[3:4])
+    scheduler.add(1)
+    assert observer.event.wait(timeout=5)
+
+    # Pending entries are sent when the scheduler stops.
+    append(entries[4:])
+    scheduler.add(2)
+    scheduler.stop()
+
+    assert [new_entries for _, new_entries in observer.updates] == [entries[:1], entries[1:4], entries[4:]]
+    assert observer.updates[-1][0].entries == entries
+
+
+class WeakObserver:
+    """Keeps only weak references, so the entries stay alive only while something else holds them."""
+
+    def __init__(self):
+        self.entries: list[weakref.ref] = []
+        self.new_entries: list[int] = []
+
+    def update(self, payload: Transcript, new_entries: list[TranscriptEntry]):
+        self.entries.extend(weakref.ref(entry) for entry in payload.entries)
+        self.new_entries.append(len(new_entries))
+
+
+def test_scheduler_does_not_keep_exported_entries():
+    store = TranscriptStore()
+    observer = WeakObserver()
+    scheduler = NotificationScheduler(observer, Config(), lambda: (store, len(store)))
+
+    for i in range(3):
+        store.append(i * 1_000_000, "Me", f"line {i}")
+        scheduler.notify()
+    gc.collect()
+
+    assert observer.new_entries == [1, 1, 1]
+    assert len(observer.entries) == 1 + 2 + 3
+    assert all(ref() is None for ref in observer.entries)
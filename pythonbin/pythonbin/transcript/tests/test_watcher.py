@@ -11,7 +11,7 @@ from pythonbin.transcript.main import (
     TranscriptFileWatcher,
 )
 from pythonbin.transcript.observer.observer import Observer
-from pythonbin.transcript.model import Transcript
+from pythonbin.transcript.model import Transcript, TranscriptEntry
 
 
 @pytest.fixture
@@ -29,10 +29,12 @@ def empty_test_file_for_writing(tmp_path) -> Generator[str, None, None]:
 class TestObserver(Observer):
     def __init__(self):
         self.seen_payloads = []
+        self.seen_new_entries = []
         self.payload_event = threading.Event()
 
-    def update(self, payload: Transcript):
+    def update(self, payload: Transcript, new_entries: list[TranscriptEntry]):
         self.seen_payloads.append(payload)
+        self.seen_new_entries.append(new_entries)
         self.payload_event.set()
 
 
@@ -50,6 +52,7 @@ def test_observer_receives_updates(empty_test_file_for_writing):
 
     assert len(observer.seen_payloads) == 1
     assert len(observer.seen_payloads[0].entries) == 1
+    assert observer.seen_new_entries[0] == observer.seen_payloads[0].entries
     entry = observer.seen_payloads[0].entries[0]
     assert entry.time == datetime.timedelta(seconds=120)
     assert entry.speaker == "Me"
@@ -0,0 +1,78 @@
+import sqlite3
+
+import numpy as np
+from chromadb import PersistentClient, Settings
+
+from pythonbin.epub.chromadb_utils import COLLECTION_NAME, initialize_chromadb
+from pythonbin.epub.codec import encode_embedding
+from pythonbin.epub.db import initialize_db
+from pythonbin.epub.models import Chapter, Ebook
+from pythonbin.epub.store import store_ebook
+
+
+def store_embedded_ebook(db_path, symbolic_name: str, n_sentences: int) -> None:
+    sentences = [f"{symbolic_name} sentence {i}" for i in range(n_sentences)]
+    store_ebook(db_path, Ebook(title=symbolic_name, chapters=[Chapter("One", "", sentences)]), symbolic_name)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT id FROM sentences WHERE embedding IS NULL").fetchall()
+        rng = np.random.default_rng(len(rows))
+        conn.executemany(
+            "UPDATE sentences SET embedding = ? WHERE id = ?",
+            [(encode_embedding(rng.standard_normal(8)), row[0]) for row in rows],
+        )
+
+
+def collection_ids(chromadb_path) -> list[str]:
+    client = PersistentClient(path=str(chromadb_path), settings=Settings(allow_reset=True))
+    collection = client.get_collection(COLLECTION_NAME)
+    return collection.get(include=[])["ids"]
+
+
+def test_initialize_chromadb_incremental(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    chromadb_path = tmp_path / "chromadb"
+    initialize_db(db_path)
+    store_embedded_ebook(db_path, "first", 30)
+
+    initialize_chromadb(db_path, chromadb_path, batch_size=7)
+    first_ids = set(collection_ids(chromadb_path))
+    assert len(first_ids) == 30
+
+    store_embedded_ebook(db_path, "second", 5)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM sentences WHERE id = 1")
+    initialize_chromadb(db_path, chromadb_path, batch_size=7)
+
+    ids = set(collection_ids(chromadb_path))
+    assert len(ids) == 34
+    # Deleting sentence 1 also changes the context of sentences 2 and 3, so those are replaced.
+    assert {id.split("-")[0] for id in first_ids - ids} == {"1", "2", "3"}
+
+
+def test_initialize_chromadb_baseline_schema(tmp_path):
+    # A database created before chapters had content hashes, indexes or settings.
+    db_path = tmp_path / "ebooks.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ebooks (id INTEGER PRIMARY KEY, title TEXT NOT NULL, symbolic_name TEXT UNIQUE NOT NULL);
+            CREATE TABLE chapters (
+                id INTEGER PRIMARY KEY, ebook_id INTEGER NOT NULL, title TEXT NOT NULL, raw_content TEXT NOT NULL
+            );
+            CREATE TABLE sentences (
+                id INTEGER PRIMARY KEY, chapter_id INTEGER NOT NULL, sentence_index INTEGER NOT NULL,
+                sentence TEXT NOT NULL, embedding BLOB
+            );
+            INSERT INTO ebooks VALUES (1, 'Old', 'old');
+            INSERT INTO chapters VALUES (1, 1, 'One', '');
+            """
+        )
+        rng = np.random.default_rng(0)
+        conn.executemany(
+            "INSERT INTO sentences VALUES (?, 1, ?, ?, ?)",
+            [(i + 1, i, f"old sentence {i}", encode_embedding(rng.standard_normal(8))) for i in range(5)],
+        )
+
+    initialize_chromadb(db_path, tmp_path / "chromadb")
+
+    assert len(collection_ids(tmp_path / "chromadb")) == 5
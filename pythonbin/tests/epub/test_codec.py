@@ -0,0 +1,102 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from pythonbin.epub.cli import main as cli_main
+from pythonbin.epub.codec import (
+    CODEC_FLOAT16,
+    CODEC_FLOAT32,
+    CODEC_INT8,
+    decode_embedding,
+    encode_embedding,
+    get_embedding_codec,
+    set_embedding_codec,
+)
+from pythonbin.epub.db import get_db_connection, initialize_db
+from pythonbin.epub.embeddings import embedding_cache_key
+from pythonbin.epub.models import Chapter, Ebook
+from pythonbin.epub.store import get_all_sentences, store_ebook
+
+
+@pytest.mark.parametrize(
+    "codec, size, tolerance",
+    [(CODEC_FLOAT32, 4096, 0.0), (CODEC_FLOAT16, 2048, 1e-3), (CODEC_INT8, 1028, 1e-2)],
+)
+def test_codec_roundtrip(codec, size, tolerance):
+    embedding = np.random.default_rng(0).standard_normal(1024).astype(np.float32)
+    embedding /= np.linalg.norm(embedding)
+
+    blob = encode_embedding(embedding, codec)
+    decoded = decode_embedding(blob, codec)
+
+    assert len(blob) == size
+    assert decoded.dtype == np.float32
+    assert np.max(np.abs(decoded - embedding)) <= tolerance
+
+
+def test_codec_recorded_in_db(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    store_ebook(db_path, Ebook(title="Book", chapters=[Chapter(title="One", raw_content="", sentences=["a"])]), "b")
+
+    with get_db_connection(db_path) as conn:
+        assert get_embedding_codec(conn) == CODEC_FLOAT32
+        set_embedding_codec(conn, CODEC_INT8)
+        conn.execute("UPDATE sentences SET embedding = ?", (encode_embedding(np.array([0.5, -1.0]), CODEC_INT8),))
+        conn.commit()
+
+        sentence = next(get_all_sentences(conn))
+        assert sentence.embedding_list == pytest.approx([0.5, -1.0], abs=1e-2)
+
+        with pytest.raises(ValueError):
+            set_embedding_codec(conn, CODEC_FLOAT16)
+
+
+def test_codec_defaults_without_settings_table():
+    conn = sqlite3.connect(":memory:")
+    assert get_embedding_codec(conn) == CODEC_FLOAT32
+
+
+def test_init_db_keeps_codec(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    cli_main(["init-db", "--db-path", str(db_path), "--embedding-codec", CODEC_INT8])
+    store_ebook(db_path, Ebook(title="Book", chapters=[Chapter(title="One", raw_content="", sentences=["a"])]), "b")
+    with get_db_connection(db_path) as conn:
+        conn.execute("UPDATE sentences SET embedding = ?", (encode_embedding(np.array([0.5, -1.0]), CODEC_INT8),))
+        conn.commit()
+
+    # Re-running without the flag keeps the stored format, asking for another one still fails.
+    cli_main(["init-db", "--db-path", str(db_path)])
+    with get_db_connection(db_path) as conn:
+        assert get_embedding_codec(conn) == CODEC_INT8
+    with pytest.raises(ValueError):
+        cli_main(["init-db", "--db-path", str(db_path), "--embedding-codec", CODEC_FLOAT16])
+
+    cli_main(["init-db", "--db-path", str(db_path), "--reset"])
+    with get_db_connection(db_path) as conn:
+        assert get_embedding_codec(conn) == CODEC_FLOAT32
+
+
+def test_codec_change_clears_embedding_cache(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    store_ebook(db_path, Ebook(title="Book", chapters=[Chapter(title="One", raw_content="", sentences=["a"])]), "b")
+    embedding = np.array([0.5, -1.0])
+
+    with get_db_connection(db_path) as conn:
+        set_embedding_codec(conn, CODEC_INT8)
+        blob = encode_embedding(embedding, CODEC_INT8)
+        conn.execute("UPDATE sentences SET embedding = ?", (blob,))
+        conn.execute(
+            "INSERT INTO embedding_cache (text_hash, embedding) VALUES (?, ?)",
+            (embedding_cache_key("model", CODEC_INT8, "a"), blob),
+        )
+        conn.commit()
+
+        # Once no sentence holds an embedding the codec may change, and the int8 blobs are not reused.
+        conn.execute("UPDATE sentences SET embedding = NULL")
+        set_embedding_codec(conn, CODEC_FLOAT32)
+        assert conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0] == 0
+
+    assert embedding_cache_key("model", CODEC_INT8, "a") != embedding_cache_key("model", CODEC_FLOAT32, "a")
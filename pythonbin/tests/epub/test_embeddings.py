@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import ClassVar
+
+import pytest
+import requests
+
+from pythonbin.epub.db import initialize_db
+from pythonbin.epub.embeddings import EmbeddingClient, SentenceProcessor
+from pythonbin.epub.jobs import JOB_DONE, JOB_FAILED, get_job
+from pythonbin.epub.models import Chapter, Ebook
+from pythonbin.epub.store import store_ebook
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    failures_remaining = 0
+    reject_after: int | None = None
+    requests_seen: ClassVar[list[list[str]]] = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if FakeOllamaHandler.reject_after is not None and len(FakeOllamaHandler.requests_seen) >= self.reject_after:
+            self.send_response(400)
+            self.end_headers()
+            return
+        if FakeOllamaHandler.failures_remaining > 0:
+            FakeOllamaHandler.failures_remaining -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        FakeOllamaHandler.requests_seen.append(body["input"])
+        embeddings = [[float(len(text)), 1.0, 2.0] for text in body["input"]]
+        payload = json.dumps({"embeddings": embeddings}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def embed_api_url() -> Generator[str, None, None]:
+    FakeOllamaHandler.failures_remaining = 0
+    FakeOllamaHandler.reject_after = None
+    FakeOllamaHandler.requests_seen = []
+    server = HTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/api/embed"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_embed_batch(embed_api_url):
+    with EmbeddingClient(api_url=embed_api_url) as client:
+        embeddings = client.embed_batch(["a", "abc"])
+
+    assert len(FakeOllamaHandler.requests_seen) == 1
+    assert embeddings[1].tolist() == [3.0, 1.0, 2.0]
+    assert client.stats.embedded == 2
+
+
+def test_embed_batch_retries(embed_api_url):
+    FakeOllamaHandler.failures_remaining = 2
+    with EmbeddingClient(api_url=embed_api_url, max_retries=2, backoff=0.01) as client:
+        embeddings = client.embed_batch(["a"])
+
+    assert len(embeddings) == 1
+    assert client.stats.latency_percentile(50) > 0
+
+
+def test_sentence_processor(embed_api_url, tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    chapters = [
+        Chapter(title=f"Chapter {i}", raw_content="", sentences=[f"s{i}.{j}" for j in range(10)]) for i in range(5)
+    ]
+    store_ebook(db_path, Ebook(title="Book", chapters=chapters), "book")
+
+    client = EmbeddingClient(api_url=embed_api_url, batch_size=3, max_in_flight=2)
+    with SentenceProcessor(
+        db_path, context_window=1, client=client, max_pending_batches=1, write_batch_size=7, flush_interval=0.05
+    ) as processor:
+        processor.start_processing()
+
+    assert processor.processed_sentences == 50
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sentences WHERE embedding IS NULL").fetchone()[0] == 0
+        job = get_job(conn, processor.job.id)  # type: ignore
+    assert job.status == JOB_DONE
+    assert job.processed_sentences == job.total_sentences == 50
+
+
+def test_sentence_processor_resume(embed_api_url, tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    chapters = [
+        Chapter(title=f"Chapter {i}", raw_content="", sentences=[f"s{i}.{j}" for j in range(10)]) for i in range(3)
+    ]
+    store_ebook(db_path, Ebook(title="Book", chapters=chapters), "book")
+
+    FakeOllamaHandler.reject_after = 2
+    client = EmbeddingClient(api_url=embed_api_url, batch_size=5, max_in_flight=1)
+    with (
+        pytest.raises(requests.HTTPError),
+        SentenceProcessor(db_path, client=client, flush_interval=0.01) as processor,
+    ):
+        processor.start_processing()
+
+    with sqlite3.connect(db_path) as conn:
+        job = get_job(conn, processor.job.id)  # type: ignore
+    assert job.status == JOB_FAILED
+    assert job.processed_sentences == 10
+    assert job.checkpoint_sentence_id == 10
+
+    FakeOllamaHandler.reject_after = None
+    FakeOllamaHandler.requests_seen = []
+    client = EmbeddingClient(api_url=embed_api_url, batch_size=5, max_in_flight=1)
+    with SentenceProcessor(db_path, client=client, resume=True) as processor:
+        processor.start_processing()
+
+    assert processor.job.id == job.id  # type: ignore
+    assert sum(len(texts) for texts in FakeOllamaHandler.requests_seen) == 20
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sentences WHERE embedding IS NULL").fetchone()[0] == 0
+        job = get_job(conn, job.id)
+    assert job.status == JOB_DONE
+    assert job.processed_sentences == 30
+
+
+def test_sentence_processor_reuses_cached_embeddings(embed_api_url, tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    shared = Chapter(title="Preface", raw_content="", sentences=["Same words.", "In every book."])
+    store_ebook(db_path, Ebook(title="First", chapters=[shared]), "first")
+
+    client = EmbeddingClient(api_url=embed_api_url, batch_size=10)
+    with SentenceProcessor(db_path, context_window=0, client=client, flush_interval=0.01) as processor:
+        processor.start_processing()
+    assert sum(len(texts) for texts in FakeOllamaHandler.requests_seen) == 2
+
+    # The second book repeats the first book's chapter twice and adds one new sentence.
+    unique = Chapter(title="Epilogue", raw_content="", sentences=["Only here."])
+    store_ebook(db_path, Ebook(title="Second", chapters=[shared, shared, unique]), "second")
+    FakeOllamaHandler.requests_seen = []
+    client = EmbeddingClient(api_url=embed_api_url, batch_size=10)
+    with SentenceProcessor(db_path, context_window=0, client=client, flush_interval=0.01) as processor:
+        processor.start_processing()
+
+    assert FakeOllamaHandler.requests_seen == [["Only here."]]
+    assert processor.cached_sentences == 4
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sentences WHERE embedding IS NULL").fetchone()[0] == 0
+        embeddings = conn.execute("SELECT DISTINCT embedding FROM sentences WHERE sentence = 'Same words.'").fetchall()
+    assert len(embeddings) == 1
@@ -0,0 +1,45 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+from pythonbin.epub.db import initialize_db
+from pythonbin.epub.library import find_epubs, store_library, symbolic_name_for
+from pythonbin.epub.utils import SEGMENTER_REGEX
+
+TEST_FILE = Path(__file__).parent / "epub30-spec.epub"
+
+
+def make_library(tmp_path: Path) -> Path:
+    library = tmp_path / "library"
+    (library / "nested").mkdir(parents=True)
+    shutil.copy(TEST_FILE, library / "First Book.epub")
+    shutil.copy(TEST_FILE, library / "nested" / "second-book.epub")
+    (library / "notes.txt").write_text("not a book")
+    return library
+
+
+def test_find_epubs(tmp_path):
+    library = make_library(tmp_path)
+
+    assert [path.name for path in find_epubs(library)] == ["First Book.epub", "second-book.epub"]
+    assert [path.name for path in find_epubs(f"{library}/*.epub")] == ["First Book.epub"]
+    assert symbolic_name_for(Path("Understanding Software Dynamics.epub")) == "understanding_software_dynamics"
+
+
+def test_store_library(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    epub_paths = find_epubs(make_library(tmp_path)) + [tmp_path / "missing.epub"]
+
+    progress = store_library(db_path, epub_paths, workers=2, segmenter=SEGMENTER_REGEX)
+
+    assert (progress.stored, progress.skipped, progress.failed) == (2, 0, 1)
+    with sqlite3.connect(db_path) as conn:
+        names = [row[0] for row in conn.execute("SELECT symbolic_name FROM ebooks ORDER BY symbolic_name")]
+        sentences = conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0]
+    assert names == ["first_book", "second_book"]
+    assert sentences == progress.sentences > 0
+
+    # Books already in the database are skipped on the next run.
+    progress = store_library(db_path, epub_paths[:2], workers=2, segmenter=SEGMENTER_REGEX)
+    assert (progress.stored, progress.skipped, progress.failed) == (0, 2, 0)
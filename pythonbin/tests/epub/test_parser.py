@@ -1,12 +1,60 @@
+import re
 from pathlib import Path
 
-from pythonbin.epub.parser import read_epub
+from bs4 import BeautifulSoup
+from ebooklib.utils import parse_html_string
+
+from pythonbin.epub import vebooklib
+from pythonbin.epub.parser import _prepare_chapter, prepare_epub, read_epub
+from pythonbin.epub.utils import BLOCK_ELEMENTS, annotate_html
+
+TEST_FILE = Path(__file__).parent / "epub30-spec.epub"
 
 
 def test_read_epub():
-    test_file = Path(__file__).parent / "epub30-spec.epub"
+    test_file = TEST_FILE
     ebook = read_epub(test_file)
     assert ebook is not None
     assert len(ebook.chapters) > 0
     for chapter in ebook.chapters:
         assert len(chapter.title) > 0
+
+
+def test_prepare_epub_skips_known_chapters():
+    test_file = TEST_FILE
+    _, prepared = prepare_epub(test_file, workers=1)
+    hashes = [chapter.content_hash for chapter, _, _ in prepared]
+    assert all(hashes)
+
+    _, again = prepare_epub(test_file, workers=1, known_hashes=hashes[1:])
+    assert [chapter.content_hash for chapter, _, _ in again] == hashes
+    assert again[0] == prepared[0]
+    assert all(text == "" and chapter.raw_content == "" for chapter, text, _ in again[1:])
+
+
+def tokens(text: str) -> str:
+    # Words and punctuation separated by single spaces, so spacing around punctuation does not matter.
+    return " ".join(re.findall(r"\w+|[^\w\s]", text))
+
+
+def test_prepare_chapter_keeps_blocks_apart():
+    book = vebooklib.read_epub(str(TEST_FILE), options={"ignore_ncx": True})
+    for item in book.get_items_of_media_type("application/xhtml+xml"):
+        raw_html = item.get_content()
+        _, text, _ = _prepare_chapter(item.get_name(), raw_html)
+        words = tokens(text)
+
+        # The text used to be extracted from BeautifulSoup's prettified HTML; the same characters come out in order.
+        body = vebooklib.EpubHtml(content=raw_html).get_body_content()
+        old_text, _ = annotate_html(BeautifulSoup(body, "lxml", from_encoding="utf-8").prettify())
+        assert "".join(text.split()) == "".join(old_text.split())
+
+        # Every block without nested blocks is separated from its neighbours, like "This version" and its URL.
+        for element in parse_html_string(raw_html).iter(*BLOCK_ELEMENTS):
+            descendants = {child.tag for child in element.iterdescendants()}
+            ancestors = {parent.tag for parent in element.iterancestors()}
+            if descendants & BLOCK_ELEMENTS or "pre" in descendants | ancestors:
+                continue
+            block_words = tokens("".join(element.itertext()))
+            if block_words.strip():
+                assert f" {block_words} " in f" {words} ", (item.get_name(), block_words)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from pythonbin.epub.embeddings import EMBEDDING_MODEL
+from pythonbin.epub.query import (
+    CACHE_EMBEDDING,
+    QUERY_PROMPT,
+    QueryCache,
+    get_query_embedding,
+)
+
+
+def test_query_cache_lru(tmp_path):
+    with QueryCache(tmp_path / "cache.db", max_entries=2) as cache:
+        cache.put(CACHE_EMBEDDING, "model", "a", b"1")
+        cache.put(CACHE_EMBEDDING, "model", "b", b"2")
+        assert cache.get(CACHE_EMBEDDING, "model", "a") == b"1"
+        cache.put(CACHE_EMBEDDING, "model", "c", b"3")
+
+        assert cache.get(CACHE_EMBEDDING, "model", "b") is None
+        assert cache.get(CACHE_EMBEDDING, "other-model", "a") is None
+        assert cache.hits == {CACHE_EMBEDDING: 1}
+        assert cache.misses == {CACHE_EMBEDDING: 2}
+
+    with QueryCache(tmp_path / "cache.db", max_entries=2) as cache:
+        assert cache.get(CACHE_EMBEDDING, "model", "c") == b"3"
+
+
+def test_get_query_embedding_cached(tmp_path):
+    embedding = np.array([0.25, 0.5], dtype=np.float32)
+    with QueryCache(tmp_path / "cache.db") as cache:
+        cache.put(CACHE_EMBEDDING, EMBEDDING_MODEL, QUERY_PROMPT.format(query="tail latency"), embedding.tobytes())
+
+        result = get_query_embedding("tail latency", expand=False, cache=cache)
+
+    assert result.tolist() == [0.25, 0.5]
@@ -0,0 +1,124 @@
+import numpy as np
+
+from pythonbin.epub import search
+from pythonbin.epub.codec import CODEC_INT8, encode_embedding, set_embedding_codec
+from pythonbin.epub.db import get_db_connection, initialize_db
+from pythonbin.epub.models import Chapter, Ebook
+from pythonbin.epub.search import (
+    build_ivf_index,
+    reciprocal_rank_fusion,
+    search_hybrid,
+    search_lexical,
+    search_sqlite,
+)
+from pythonbin.epub.store import store_ebook
+
+
+def make_db(tmp_path, embeddings: np.ndarray, codec: str | None = None):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    sentences = [f"sentence {i}" for i in range(len(embeddings))]
+    store_ebook(db_path, Ebook(title="Book", chapters=[Chapter(title="One", raw_content="", sentences=sentences)]), "b")
+    with get_db_connection(db_path) as conn:
+        if codec is not None:
+            set_embedding_codec(conn, codec)
+        conn.executemany(
+            "UPDATE sentences SET embedding = ? WHERE id = ?",
+            [(encode_embedding(embedding, codec or "float32"), i + 1) for i, embedding in enumerate(embeddings)],
+        )
+        conn.commit()
+    return db_path
+
+
+def test_search_sqlite_brute_force(tmp_path):
+    embeddings = np.random.default_rng(0).standard_normal((200, 16)).astype(np.float32)
+    db_path = make_db(tmp_path, embeddings, codec=CODEC_INT8)
+
+    with get_db_connection(db_path) as conn:
+        results = search_sqlite(conn, embeddings[42], k=3, context_window=0)
+
+    assert results[0].sentence_id == 43
+    assert results[0].sentence_context == "sentence 42"
+    assert results[0].score > results[1].score > results[2].score
+
+
+def test_search_sqlite_reuses_embedding_matrix(tmp_path, monkeypatch):
+    embeddings = np.random.default_rng(3).standard_normal((50, 16)).astype(np.float32)
+    db_path = make_db(tmp_path, embeddings)
+
+    with get_db_connection(db_path) as conn:
+        assert search_sqlite(conn, embeddings[4], k=1)[0].sentence_id == 5
+    first_files = sorted(path.name for path in tmp_path.glob("ebooks.db.embedding*.npy"))
+    assert len(first_files) == 2
+
+    # Later searches map the saved matrix instead of reading the table.
+    with monkeypatch.context() as patch:
+        patch.setattr(search, "load_all_embeddings", None)
+        with get_db_connection(db_path) as conn:
+            assert search_sqlite(conn, embeddings[9], k=1)[0].sentence_id == 10
+
+    # Changing an embedding rebuilds the matrix and removes the old files.
+    with get_db_connection(db_path) as conn:
+        conn.execute("UPDATE sentences SET embedding = ? WHERE id = 1", (encode_embedding(embeddings[9] * 2),))
+        conn.execute("DELETE FROM sentences WHERE id = 10")
+        conn.commit()
+        assert search_sqlite(conn, embeddings[9], k=1)[0].sentence_id == 1
+    files = sorted(path.name for path in tmp_path.glob("ebooks.db.embedding*.npy"))
+    assert len(files) == 2 and not set(files) & set(first_files)
+
+
+def test_search_sqlite_ivf(tmp_path):
+    embeddings = np.random.default_rng(1).standard_normal((500, 16)).astype(np.float32)
+    db_path = make_db(tmp_path, embeddings)
+
+    with get_db_connection(db_path) as conn:
+        assert build_ivf_index(conn, n_lists=10) == 10
+        exact = search_sqlite(conn, embeddings[7], k=1)
+        approximate = search_sqlite(conn, embeddings[7], k=1, use_ivf=True, n_probe=2)
+        assert conn.execute("SELECT COUNT(*) FROM ivf_lists").fetchone()[0] == 500
+
+    assert exact[0].sentence_id == approximate[0].sentence_id == 8
+
+
+def test_build_ivf_index_limits_lists_to_training_points(tmp_path):
+    embeddings = np.random.default_rng(4).standard_normal((40, 16)).astype(np.float32)
+    db_path = make_db(tmp_path, embeddings)
+
+    with get_db_connection(db_path) as conn:
+        assert build_ivf_index(conn, n_lists=30, max_training_points=10) == 10
+        assert search_sqlite(conn, embeddings[3], k=1, use_ivf=True, n_probe=10)[0].sentence_id == 4
+
+
+def test_search_lexical(tmp_path):
+    embeddings = np.random.default_rng(2).standard_normal((5, 16)).astype(np.float32)
+    db_path = make_db(tmp_path, embeddings)
+    with get_db_connection(db_path) as conn:
+        conn.execute("UPDATE sentences SET sentence = 'Call get_item_with_href (O(1)) AND NEAR the TOC.' WHERE id = 3")
+        conn.execute("DELETE FROM sentences WHERE id = 5")
+        conn.commit()
+
+        results = search_lexical(conn, "get_item_with_href", k=3, context_window=0)
+        assert [result.sentence_id for result in results] == [3]
+        assert search_lexical(conn, "get_item", k=3) == []
+        # Punctuation and FTS5 operators in the query are matched as plain words.
+        assert [result.sentence_id for result in search_lexical(conn, "near (toc)", k=3)] == [3]
+        # Sentences that were changed or deleted are no longer found by their old text.
+        assert {result.sentence_id for result in search_lexical(conn, "sentence", k=10)} == {1, 2, 4}
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[(1, 9.0), (2, 8.0), (3, 7.0)], [(3, 0.9), (4, 0.8)]], k=3, rrf_k=60)
+    assert [sentence_id for sentence_id, _ in fused] == [3, 1, 2]
+    assert fused[0][1] == 1 / 63 + 1 / 61
+
+
+def test_search_hybrid(tmp_path):
+    embeddings = np.random.default_rng(3).standard_normal((50, 16)).astype(np.float32)
+    db_path = make_db(tmp_path, embeddings)
+
+    with get_db_connection(db_path) as conn:
+        # "sentence 7" matches sentence 7 lexically and the query embedding points at sentence 7 too.
+        results = search_hybrid(conn, "sentence 7", embeddings[7], k=3, context_window=0)
+
+    assert results[0].sentence_id == 8
+    assert results[0].sentence_context == "sentence 7"
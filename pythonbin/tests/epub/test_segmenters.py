@@ -0,0 +1,38 @@
+from pythonbin.epub.benchmark import benchmark_segmenters
+from pythonbin.epub.utils import (
+    SEGMENTER_REGEX,
+    SEGMENTER_SENTENCIZER,
+    HTMLToText,
+    RegexSegmenter,
+)
+
+
+def test_regex_segmenter():
+    text = "First sentence. Second one? Yes!\n\nA new paragraph without a full stop\n\ne.g. this stays together."
+    spans = RegexSegmenter().split_text(text)
+    assert [text[start:end].strip() for start, end in spans] == [
+        "First sentence.",
+        "Second one?",
+        "Yes!",
+        "A new paragraph without a full stop",
+        "e.g. this stays together.",
+    ]
+
+
+def test_html_to_sentences_merges_pre():
+    html = "<p>Run this. Then that.</p><pre>x = 1. y = 2.</pre><p>Done.</p>"
+    sentences = HTMLToText(SEGMENTER_REGEX).html_to_sentences(html)
+    assert sentences == ["Run this.", "Then that.", "x = 1. y = 2.", "Done."]
+
+
+def test_benchmark_segmenters():
+    benchmarks = benchmark_segmenters(
+        segmenters=(SEGMENTER_SENTENCIZER, SEGMENTER_REGEX), reference=SEGMENTER_SENTENCIZER
+    )
+
+    sentencizer, regex = benchmarks
+    assert sentencizer.f1 == 1.0
+    assert 0.0 < regex.f1 <= 1.0
+    assert regex.chapters > 0
+    assert regex.chapters_per_second > 0
+    assert regex.peak_rss_bytes > 0
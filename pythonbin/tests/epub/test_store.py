@@ -0,0 +1,112 @@
+import sqlite3
+import time
+
+from pythonbin.epub.db import initialize_db
+from pythonbin.epub.models import Chapter, Ebook
+from pythonbin.epub.store import (
+    get_all_sentences,
+    get_chapter_hashes,
+    get_sentence_context,
+    store_ebook,
+)
+
+
+def make_ebook(n_chapters: int, n_sentences: int) -> Ebook:
+    ebook = Ebook(title="Benchmark")
+    for i in range(n_chapters):
+        sentences = [f"Chapter {i} sentence {j} talks about latency and throughput." for j in range(n_sentences)]
+        ebook.chapters.append(Chapter(title=f"Chapter {i}", raw_content="<p></p>", sentences=sentences))
+    return ebook
+
+
+def test_store_ebook(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    ebook = make_ebook(n_chapters=3, n_sentences=4)
+
+    store_ebook(db_path, ebook, "benchmark", batch_size=5)
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT chapter_id, sentence_index, sentence FROM sentences ORDER BY id").fetchall()
+        fts_rows = conn.execute("SELECT rowid FROM sentences_fts WHERE sentences_fts MATCH 'latency'").fetchall()
+        triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert len(rows) == 12
+    assert [row[1] for row in rows[:4]] == [0, 1, 2, 3]
+    assert rows[4][0] != rows[0][0]
+    # Sentences are indexed in bulk and the per-row trigger is back for later inserts.
+    assert len(fts_rows) == 12
+    assert "sentences_fts_insert" in triggers
+
+
+def test_store_ebook_throughput(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    ebook = make_ebook(n_chapters=50, n_sentences=1000)
+    total_sentences = sum(len(chapter.sentences) for chapter in ebook.chapters)
+
+    start = time.perf_counter()
+    store_ebook(db_path, ebook, "benchmark", defer_index=True)
+    elapsed = time.perf_counter() - start
+    print(f"Stored {total_sentences} sentences in {elapsed:.2f}s ({total_sentences / elapsed:.0f} sentences/sec)")
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0] == total_sentences
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_sentence_index" in indexes
+
+
+def test_get_all_sentences_context(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    ebook = make_ebook(n_chapters=3, n_sentences=7)
+    ebook.chapters.append(Chapter(title="Short", raw_content="<p></p>", sentences=["Only one."]))
+    store_ebook(db_path, ebook, "benchmark")
+
+    with sqlite3.connect(db_path) as conn:
+        for window_size in (0, 1, 2, 5):
+            sentences = list(get_all_sentences(conn, context_window=window_size))
+            assert len(sentences) == 22
+            for sentence in sentences:
+                expected = get_sentence_context(conn, sentence.chapter_id, sentence.sentence_index, window_size)
+                assert sentence.sentence_context == expected
+
+        conn.execute("UPDATE sentences SET embedding = x'00' WHERE sentence_index != 3")
+        missing = list(get_all_sentences(conn, embedding_missing=True, context_window=1))
+        assert [sentence.sentence_index for sentence in missing] == [3, 3, 3]
+        assert missing[0].sentence_context == " ".join(ebook.chapters[0].sentences[2:5])
+
+
+def test_store_ebook_again_keeps_unchanged_chapters(tmp_path):
+    db_path = tmp_path / "ebooks.db"
+    initialize_db(db_path)
+    chapters = [
+        Chapter(title=f"Chapter {i}", raw_content="<p></p>", sentences=[f"c{i}.{j}" for j in range(3)], content_hash=h)
+        for i, h in enumerate(["a", "b", "c"])
+    ]
+    store_ebook(db_path, Ebook(title="Book", chapters=chapters), "book")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE sentences SET embedding = x'00'")
+        kept_ids = [row[0] for row in conn.execute("SELECT id FROM sentences WHERE sentence LIKE 'c0.%' ORDER BY id")]
+    assert get_chapter_hashes(db_path, "book") == ["a", "b", "c"]
+
+    # Chapter "b" changed, "c" was removed and "d" is new; "a" is unchanged and comes back without its sentences.
+    chapters = [
+        Chapter(title="Chapter 0", raw_content="", content_hash="a"),
+        Chapter(title="Chapter 1", raw_content="<p></p>", sentences=["changed"], content_hash="b2"),
+        Chapter(title="Chapter 3", raw_content="<p></p>", sentences=["new", "chapter"], content_hash="d"),
+    ]
+    store_ebook(db_path, Ebook(title="Book, 2nd edition", chapters=chapters), "book")
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT title FROM ebooks").fetchall() == [("Book, 2nd edition",)]
+        rows = conn.execute(
+            "SELECT s.id, s.sentence, s.embedding IS NOT NULL FROM sentences s JOIN chapters c ON c.id = s.chapter_id "
+            "ORDER BY c.chapter_index, s.sentence_index"
+        ).fetchall()
+    assert [row[1] for row in rows] == ["c0.0", "c0.1", "c0.2", "changed", "new", "chapter"]
+    assert [row[0] for row in rows[:3]] == kept_ids
+    assert [row[2] for row in rows] == [1, 1, 1, 0, 0, 0]
+    # New sentences are appended after every existing one, so ids still increase in chapter order.
+    assert [row[0] for row in rows] == sorted(row[0] for row in rows)
+    assert get_chapter_hashes(db_path, "book") == ["a", "b2", "d"]
+    assert get_chapter_hashes(db_path, "other") == []
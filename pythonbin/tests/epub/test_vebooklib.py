@@ -0,0 +1,92 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from pythonbin.epub import vebooklib
+
+TEST_FILE = Path(__file__).parent / "epub30-spec.epub"
+
+
+def _contents(book: vebooklib.EpubBook) -> dict[str, bytes]:
+    return {item.get_name(): item.get_content() for item in book.get_items()}
+
+
+def test_lazy_read_matches_eager_read():
+    eager = vebooklib.read_epub(str(TEST_FILE), options={"ignore_ncx": True})
+    lazy = vebooklib.read_epub(str(TEST_FILE), options={"ignore_ncx": True, "lazy": True})
+    try:
+        assert [item.get_name() for item in lazy.get_items()] == [item.get_name() for item in eager.get_items()]
+        assert lazy.toc
+        assert _contents(lazy) == _contents(eager)
+    finally:
+        lazy.close()
+
+
+def test_lazy_items_load_on_access_and_release():
+    book = vebooklib.read_epub(str(TEST_FILE), options={"ignore_ncx": True, "lazy": True})
+    try:
+        image = next(book.get_items_of_type(vebooklib.ebooklib.ITEM_IMAGE))
+        assert image._content is None
+
+        content = image.get_content()
+        assert content
+        assert image._content is content
+
+        image.release_content()
+        assert image._content is None
+        assert image.get_content() == content
+    finally:
+        book.close()
+
+    # content that is not loaded can't be read after the book is closed
+    image.release_content()
+    with pytest.raises(ValueError):
+        image.get_content()
+
+
+def test_reader_name_index():
+    reader = vebooklib.EpubReader(str(TEST_FILE), options={"ignore_ncx": True})
+    reader.load()
+
+    assert reader.has_file("./" + reader.opf_file)
+    assert not reader.has_file(reader.opf_file + ".missing")
+
+
+def test_book_lookups_match_scans():
+    book = vebooklib.read_epub(str(TEST_FILE), options={"ignore_ncx": True})
+
+    for item in book.get_items():
+        assert book.get_item_with_id(item.get_id()) is next(i for i in book.items if i.id == item.get_id())
+        assert book.get_item_with_href(item.get_name()) is next(
+            i for i in book.items if i.get_name() == item.get_name()
+        )
+        assert list(book.get_items_of_type(item.get_type())) == [
+            i for i in book.items if i.get_type() == item.get_type()
+        ]
+        assert list(book.get_items_of_media_type(item.media_type)) == [
+            i for i in book.items if i.media_type == item.media_type
+        ]
+    assert book.get_item_with_href("missing.xhtml") is None
+    assert list(book.get_items_of_media_type("missing/type")) == []
+
+
+def test_add_item_updates_lookups():
+    book = vebooklib.EpubBook()
+    chapter = book.add_item(vebooklib.EpubHtml(file_name="text/chapter.xhtml"))
+    duplicate = book.add_item(vebooklib.EpubHtml(uid=chapter.get_id(), file_name="text/chapter.xhtml"))
+    image = book.add_item(vebooklib.EpubImage(file_name="images/cover.png"))
+
+    assert book.get_item_with_id(chapter.get_id()) is chapter
+    assert book.get_item_with_href("text/../text/chapter.xhtml") is chapter
+    assert list(book.get_items_of_type(vebooklib.ebooklib.ITEM_DOCUMENT)) == [chapter, duplicate]
+    assert list(book.get_items_of_media_type("image/png")) == [image]
+
+
+def test_read_extracted_directory(tmp_path):
+    with zipfile.ZipFile(TEST_FILE) as zf:
+        zf.extractall(tmp_path)
+
+    from_directory = vebooklib.read_epub(str(tmp_path), options={"ignore_ncx": True})
+    from_zip = vebooklib.read_epub(str(TEST_FILE), options={"ignore_ncx": True})
+    assert _contents(from_directory) == _contents(from_zip)